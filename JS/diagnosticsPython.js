@@ -2,55 +2,75 @@ const vscode = require("vscode");
 const { getPythonScriptResult } = require("./runPython.js");
 const { t } = require("./language.js");
 
-function checkForLoopVariableConflict(document) {
-  const text = document.getText();
-  // 正则表达式匹配 for 循环的循环变量和迭代对象
-  const re = /for\s+([0-9a-zA-Z_]+)\s+in\s+([0-9a-zA-Z_]+):/g;
-  const match = re.exec(text);
-  const diagnostics = [];
-  if (match) {
-    const variable = match[1]; // 循环变量
-    const iterable = match[2]; // 迭代对象
-    const all = match[0]; // 完整的匹配字符串
-    if (variable === iterable) {
-      // 如果循环变量与迭代对象重名，创建诊断信息
-      const start1 = match.index + all.indexOf(variable);
-      const end1 = start1 + variable.length;
+// 诊断开关与对应的 Python 分析模式
+const DIAGNOSTIC_MODES = {
+  checkForLoopVariableConflict: "get_for_loop_variable_conflicts",
+  checkImportVsLocalClassConflict: "get_modules_with_name_conflicts",
+  checkMissingSuperInit: "get_classes_without_parent_init_call",
+};
 
-      const start2 = match.index + all.lastIndexOf(iterable);
-      const end2 = start2 + iterable.length;
+/**
+ * 在一次 Python 调用中执行所有启用的诊断，共享同一次解析与遍历
+ * @param {vscode.TextDocument} document - 当前打开的文档
+ * @param {object} enabled - 以 pycodejojo.* 开关名为键的启用状态
+ * @returns {Promise<vscode.Diagnostic[]>}
+ */
+async function checkPythonDiagnostics(document, enabled) {
+  const modes = Object.keys(DIAGNOSTIC_MODES)
+    .filter((setting) => enabled[setting])
+    .map((setting) => DIAGNOSTIC_MODES[setting]);
+  if (!modes.length) return [];
 
-      const diagnostic = new vscode.Diagnostic(
-        new vscode.Range(
-          document.positionAt(start1),
-          document.positionAt(end1)
-        ),
-        t("checkForLoopVariableConflict.variableConflict"),
-        vscode.DiagnosticSeverity.Warning
-      );
-      const diagnostic2 = new vscode.Diagnostic(
-        new vscode.Range(
-          document.positionAt(start2),
-          document.positionAt(end2)
-        ),
-        t("checkForLoopVariableConflict.variableConflict"),
-        vscode.DiagnosticSeverity.Warning
+  const exemptBases = vscode.workspace
+    .getConfiguration("pycodejojo")
+    .get("superInitExemptBases");
+  const result = await getPythonScriptResult(document, modes, {
+    superInitExemptBases: exemptBases,
+  });
+  if (!result || Array.isArray(result)) return [];
+
+  return [
+    ...checkForLoopVariableConflict(
+      document,
+      result.get_for_loop_variable_conflicts
+    ),
+    ...checkImportVsLocalClassConflict(
+      document,
+      result.get_modules_with_name_conflicts
+    ),
+    ...checkMissingSuperInit(
+      document,
+      result.get_classes_without_parent_init_call
+    ),
+  ];
+}
+
+function checkForLoopVariableConflict(document, ranges) {
+  if (!ranges) return [];
+
+  const diagnostics = [];
+  for (const item of ranges) {
+    // 循环变量与迭代对象中的同名名称各报告一次
+    for (const [start, end] of [item.variable, item.iterable]) {
+      diagnostics.push(
+        new vscode.Diagnostic(
+          new vscode.Range(document.positionAt(start), document.positionAt(end)),
+          t("checkForLoopVariableConflict.variableConflict"),
+          vscode.DiagnosticSeverity.Warning
+        )
       );
-      diagnostics.push(diagnostic, diagnostic2); // 添加诊断信息
     }
   }
   return diagnostics;
 }
 
-async function checkImportVsLocalClassConflict(document) {
-  const ranges = await getPythonScriptResult(
-    document,
-    "get_modules_with_name_conflicts"
-  );
+function checkImportVsLocalClassConflict(document, ranges) {
   if (!ranges) return [];
 
   const diagnostics = [];
   for (const item of ranges) {
+    // item.import 为 {name, asname}，冲突的是导入语句绑定的名称：有别名时为别名，否则为第一段名称
+    const importRange = item.import.asname || item.import.name[0];
     const d_class = new vscode.Diagnostic(
       new vscode.Range(
         document.positionAt(item.class[0]),
@@ -61,8 +81,8 @@ async function checkImportVsLocalClassConflict(document) {
     );
     const d_import = new vscode.Diagnostic(
       new vscode.Range(
-        document.positionAt(item.import[0]),
-        document.positionAt(item.import[1])
+        document.positionAt(importRange[0]),
+        document.positionAt(importRange[1])
       ),
       t("checkImportVsLocalClassConflict.importConflict"),
       vscode.DiagnosticSeverity.Warning
@@ -72,11 +92,7 @@ async function checkImportVsLocalClassConflict(document) {
   return diagnostics;
 }
 
-async function checkMissingSuperInit(document) {
-  const ranges = await getPythonScriptResult(
-    document,
-    "get_classes_without_parent_init_call"
-  );
+function checkMissingSuperInit(document, ranges) {
   if (!ranges) return [];
   const diagnostics = [];
   for (const item of ranges) {
@@ -96,6 +112,7 @@ async function checkMissingSuperInit(document) {
 }
 
 module.exports = {
+  checkPythonDiagnostics,
   checkForLoopVariableConflict,
   checkImportVsLocalClassConflict,
   checkMissingSuperInit,
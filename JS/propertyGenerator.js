@@ -1,64 +1,41 @@
 const vscode = require("vscode");
 const { t } = require("./language.js");
+const { getPythonScriptResult } = require("./runPython.js");
 
 async function propertyGenerator(document, range) {
   const editor = vscode.window.activeTextEditor;
   if (!editor) return;
 
-  const classStartLine = getClassStartLine(document, range);
-  if (!classStartLine) {
+  // 由 Python 端解析语法树：定位所在的类，收集选区中的 self._x 赋值及已有的 property，
+  // 没有选中内容时处理整个类
+  const selection = editor.selection.isEmpty ? range : editor.selection;
+  const result = await getPythonScriptResult(
+    document,
+    "property_stubs",
+    undefined,
+    [
+      "--offset",
+      String(document.offsetAt(selection.start)),
+      "--selection-end",
+      String(document.offsetAt(selection.end)),
+    ]
+  );
+  if (!result || Array.isArray(result)) {
     vscode.window.showErrorMessage("No class found");
     return;
   }
 
-  const classEndLine = getClassEndLine(document, classStartLine);
-  const text = document.getText(
-    new vscode.Range(classStartLine, 0, classEndLine, 0)
-  );
-
-  const selectedText = editor.document.getText(editor.selection);
-
-  const reSelfProperty =
-    /\s*self\s*\.\s*_(\w+)\s*[:\w\[\],\.\s]*[=\+\-\*/]+\s*/g;
-
-  const matches = [...selectedText.matchAll(reSelfProperty)];
-
-  if (matches.length === 0) {
+  if (result.attributes.length === 0) {
     vscode.window.showInformationMessage(
       t("propertyGenerator.needPrivateAttribute")
     );
     return;
   }
 
-  let pythonCode = "";
-
-  for (const match of matches) {
-    const name = match[1];
-    const rePropertyFunc = new RegExp(
-      `@\\s*property\\s+def\\s${name}\\s*\\(\\s*self`,
-      "gs"
-    );
-    const rePropertySetterFunc = new RegExp(
-      `@\\s*${name}\\s*\\.\\s*setter\\s+def\\s+${name}\\s*\\(\\s*self`,
-      "gs"
-    );
-
-    if (!text.match(rePropertyFunc)) {
-      pythonCode += `
-    @property
-    def ${name}(self):
-        return self._${name}
-    `;
-    }
-    if (!text.match(rePropertySetterFunc)) {
-      pythonCode += `
-    @${name}.setter
-    def ${name}(self, value):
-        self._${name} = value
-    `;
-    }
-  }
-
+  // Python 端生成的代码总是以 \n 换行，插入前换成文档的换行符，
+  // 否则在 CRLF 文档中按长度计算的结束位置每行少一个字符
+  const eol = document.eol === vscode.EndOfLine.CRLF ? "\r\n" : "\n";
+  const pythonCode = result.stubs && result.stubs.replace(/\n/g, eol);
   if (!pythonCode) {
     vscode.window.showInformationMessage(
       t("propertyGenerator.propertyAlreadyExists")
@@ -66,18 +43,14 @@ async function propertyGenerator(document, range) {
     return;
   }
 
-  const insertPosition = new vscode.Position(classEndLine, 0);
+  const insertPosition = document.positionAt(result.offset);
 
   await editor.edit((editBuilder) => {
-    editBuilder.insert(insertPosition, pythonCode + "\n");
+    editBuilder.insert(insertPosition, pythonCode);
   });
 
   // 计算插入代码的结束位置
-  const insertedLines = pythonCode.split("\n").length;
-  const endPosition = new vscode.Position(
-    classEndLine + insertedLines - 1,
-    document.lineAt(classEndLine + insertedLines - 1).text.length
-  );
+  const endPosition = document.positionAt(result.offset + pythonCode.length);
 
   // 创建一个选择区域来高亮显示新插入的代码
   editor.selection = new vscode.Selection(insertPosition, endPosition);
@@ -91,30 +64,4 @@ async function propertyGenerator(document, range) {
   vscode.window.showInformationMessage(t("propertyGenerator.propertyAdded"));
 }
 
-function getClassStartLine(document, range) {
-  // 1. 向上查找class定义
-  let classLine = range.start.line;
-  while (classLine >= 0) {
-    const lineText = document.lineAt(classLine).text;
-    if (/^\s*class\s+\w+/.test(lineText)) return classLine;
-    classLine--;
-  }
-
-  if (classLine < 0) return null;
-}
-
-function getClassEndLine(document, classStartLine) {
-  const classIndent =
-    document.lineAt(classStartLine).firstNonWhitespaceCharacterIndex;
-
-  let endLine = classStartLine + 1;
-  for (; endLine < document.lineCount; endLine++) {
-    const lineText = document.lineAt(endLine).text;
-    if (lineText.trim() === "") continue;
-    const indent = document.lineAt(endLine).firstNonWhitespaceCharacterIndex;
-    if (indent <= classIndent) break;
-  }
-  return endLine;
-}
-
 module.exports = { propertyGenerator };
@@ -17,15 +17,28 @@ const pyFile = path.join(__dirname, "..", "python", "main.py");
 /**
  * 获取 Python 脚本执行结果
  * @param {vscode.TextDocument} document - 当前打开的文档
- * @param {string} [options="get_classes_without_parent_init_call"] - 执行模式选项
+ * @param {string|string[]} [options="get_classes_without_parent_init_call"] - 执行模式选项，
+ *   为数组时以 --modes 一次执行多个模式，结果以模式名为键
+ * @param {object} [settings] - 影响结果的 pycodejojo.* 设置
+ * @param {string[]} [extraArgs=[]] - 传给 main.py 的其他命令行参数
  * @returns {Promise<Array>} - Python 脚本执行结果的 Promise
  */
 async function getPythonScriptResult(
   document,
-  options = "get_classes_without_parent_init_call"
+  options = "get_classes_without_parent_init_call",
+  settings = undefined,
+  extraArgs = []
 ) {
   const args = [pyFile];
-  args.push("--mode", options);
+  if (Array.isArray(options)) {
+    args.push("--modes", options.join(","));
+  } else {
+    args.push("--mode", options);
+  }
+  if (settings) {
+    args.push("--settings", JSON.stringify(settings));
+  }
+  args.push(...extraArgs);
 
   return new Promise((resolve) => {
     const py = spawn("python", args);
@@ -35,8 +48,17 @@ async function getPythonScriptResult(
     py.stdout.on("data", (data) => (stdout += data));
     py.stderr.on("data", (data) => (stderr += data));
     py.on("close", () => {
-      if (stderr) {
-        vscode.window.showErrorMessage(stderr);
+      // 开启 --profile / PYCODEJOJO_PROFILE 时，指标以 {"_metrics": ...} 单独一行写入 stderr
+      const errors = [];
+      for (const line of stderr.split(/\r?\n/)) {
+        if (line.startsWith('{"_metrics"')) {
+          console.log(line);
+        } else if (line.trim()) {
+          errors.push(line);
+        }
+      }
+      if (errors.length) {
+        vscode.window.showErrorMessage(errors.join("\n"));
       }
       // 修复：如果没有输出则直接返回空数组，避免 JSON.parse 报错
       if (!stdout || !stdout.trim()) {
@@ -55,6 +77,94 @@ async function getPythonScriptResult(
   });
 }
 
+/**
+ * 从缓冲区中取出完整的帧，帧格式见 python/wire_format.py：
+ * <u32 头部长度><u32 数据块长度><头部 JSON><int32 数据块>
+ * @param {Buffer} buffer - 尚未解码的字节
+ * @param {function(object): void} onFrame - 每解码一帧调用一次
+ * @returns {Buffer} - 剩余的不完整帧
+ */
+function decodeFrames(buffer, onFrame) {
+  let pos = 0;
+  while (buffer.length - pos >= 8) {
+    const headerLen = buffer.readUInt32LE(pos);
+    const blobLen = buffer.readUInt32LE(pos + 4);
+    const end = pos + 8 + headerLen + blobLen;
+    if (buffer.length < end) break;
+    const header = JSON.parse(
+      buffer.toString("utf8", pos + 8, pos + 8 + headerLen)
+    );
+    if (header.packed) {
+      // 结果为空时数据块为空，列仍是 [0, 0] 形式的位置，需要还原为空数组；
+      // 复制到新的 ArrayBuffer，保证 Int32Array 按 4 字节对齐
+      const start = pos + 8 + headerLen;
+      const blob = new Int32Array(
+        buffer.buffer.slice(
+          buffer.byteOffset + start,
+          buffer.byteOffset + start + blobLen
+        )
+      );
+      for (const [name, [offset, count]] of Object.entries(header.ints)) {
+        header.ints[name] = blob.subarray(offset, offset + count);
+      }
+    }
+    onFrame(header);
+    pos = end;
+  }
+  return buffer.subarray(pos);
+}
+
+/**
+ * 以 --format compact 执行多个分析模式，每个规则完成后立即回调其列式结果
+ * @param {vscode.TextDocument} document - 当前打开的文档
+ * @param {string[]} modes - 分析模式列表
+ * @param {object} [settings] - 影响结果的 pycodejojo.* 设置
+ * @param {function(string, object): void} [onFrame] - 收到一个模式的结果时调用，
+ *   参数为模式名与 {n, ints, values}
+ * @param {boolean} [binary=true] - 整数列是否以 int32 打包
+ * @returns {Promise<object>} - 以模式名为键的列式结果
+ */
+async function getPythonScriptFrames(
+  document,
+  modes,
+  settings = undefined,
+  onFrame = undefined,
+  binary = true
+) {
+  const args = [pyFile, "--modes", modes.join(",")];
+  args.push("--format", binary ? "compact-binary" : "compact");
+  if (settings) {
+    args.push("--settings", JSON.stringify(settings));
+  }
+
+  return new Promise((resolve) => {
+    const py = spawn("python", args);
+    const results = {};
+    let pending = Buffer.alloc(0);
+    let stderr = "";
+
+    py.stdout.on("data", (data) => {
+      pending = decodeFrames(Buffer.concat([pending, data]), (frame) => {
+        if (frame.end) return;
+        results[frame.mode] = frame;
+        if (onFrame) onFrame(frame.mode, frame);
+      });
+    });
+    py.stderr.on("data", (data) => (stderr += data));
+    py.on("close", () => {
+      const errors = stderr
+        .split(/\r?\n/)
+        .filter((line) => line.trim() && !line.startsWith('{"_metrics"'));
+      if (errors.length) {
+        vscode.window.showErrorMessage(errors.join("\n"));
+      }
+      resolve(results);
+    });
+    py.stdin.write(document.getText());
+    py.stdin.end();
+  });
+}
+
 /**
  * 检查 Python 环境是否可用
  * @returns {Promise<boolean>} - Python 环境是否可用的 Promise
@@ -89,4 +199,9 @@ function checkPythonEnvironment() {
   });
 }
 
-module.exports = { getPythonScriptResult, checkPythonEnvironment };
+module.exports = {
+  getPythonScriptResult,
+  getPythonScriptFrames,
+  decodeFrames,
+  checkPythonEnvironment,
+};
@@ -1,7 +1,7 @@
 const vscode = require("vscode");
 const fs = require("fs");
 const path = require("path");
-const { getPythonScriptResult } = require("./runPython.js");
+const { getPythonScriptFrames } = require("./runPython.js");
 
 async function applyTheme(themeName) {
   console.info("Applying: ", themeName);
@@ -66,30 +66,26 @@ class PythonSyntaxHighlighter {
 
     const text = editor.document.getText();
 
-    const importNamesRanges = await getPythonScriptResult(
+    const { get_import_names_range: importNames } = await getPythonScriptFrames(
       editor.document,
-      "get_import_names_range"
+      ["get_import_names_range"]
     );
 
+    // 列式结果：name 为所有名称区间依次展开的偏移，asname 缺失时为 -1
     const editorRanges = [];
-    Object.values(importNamesRanges).forEach((range) => {
-      if (range.asname) {
-        editorRanges.push(
-          new vscode.Range(
-            editor.document.positionAt(range.asname[0]),
-            editor.document.positionAt(range.asname[1])
-          )
-        );
+    if (importNames) {
+      for (const column of [importNames.ints.name, importNames.ints.asname]) {
+        for (let i = 0; i < column.length; i += 2) {
+          if (column[i] < 0) continue;
+          editorRanges.push(
+            new vscode.Range(
+              editor.document.positionAt(column[i]),
+              editor.document.positionAt(column[i + 1])
+            )
+          );
+        }
       }
-      range.name.forEach((array) => {
-        editorRanges.push(
-          new vscode.Range(
-            editor.document.positionAt(array[0]),
-            editor.document.positionAt(array[1])
-          )
-        );
-      });
-    });
+    }
 
     editor.setDecorations(this.importNameStyle, editorRanges);
 
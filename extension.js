@@ -7,11 +7,7 @@ const vscode = require("vscode");
 const diagnosticCollection =
   vscode.languages.createDiagnosticCollection("python");
 
-const {
-  checkForLoopVariableConflict,
-  checkImportVsLocalClassConflict,
-  checkMissingSuperInit,
-} = require("./JS/diagnosticsPython.js");
+const { checkPythonDiagnostics } = require("./JS/diagnosticsPython.js");
 
 const {
   ColorPicker,
@@ -45,20 +41,12 @@ async function checkPythonCode(document) {
     return;
   }
 
-  const results = [];
-
-  if (enable_CheckForLoopVariableConflict)
-    results.push(...checkForLoopVariableConflict(document));
-
-  if (enable_CheckImportVsLocalClassConflict) {
-    const r = await checkImportVsLocalClassConflict(document);
-    results.push(...r);
-  }
-
-  if (enable_CheckMissingSuperInit) {
-    const r = await checkMissingSuperInit(document);
-    results.push(...r);
-  }
+  // 所有启用的诊断在一次 Python 调用中完成
+  const results = await checkPythonDiagnostics(document, {
+    checkForLoopVariableConflict: enable_CheckForLoopVariableConflict,
+    checkImportVsLocalClassConflict: enable_CheckImportVsLocalClassConflict,
+    checkMissingSuperInit: enable_CheckMissingSuperInit,
+  });
 
   diagnosticCollection.set(document.uri, results);
 }
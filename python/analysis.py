@@ -0,0 +1,112 @@
+import ast
+
+from ast_parse import Range
+from budget import Budget
+from metrics import Metrics
+from rule_engine import RuleEngine
+
+
+# 基于 Range 的分析模式，可在同一次解析中批量执行
+ANALYSIS_MODES = RuleEngine().names
+
+
+def resolve_modes(modes) -> list[str]:
+    """
+    解析模式列表，支持逗号分隔字符串以及 "all"。
+
+    :param modes: 模式列表或逗号分隔的字符串
+    :return: 去重后的模式列表
+    """
+    if isinstance(modes, str):
+        modes = modes.split(",")
+    resolved = []
+    for mode in modes:
+        mode = mode.strip()
+        if mode == "all":
+            resolved.extend(ANALYSIS_MODES)
+        elif mode:
+            resolved.append(mode)
+    return list(dict.fromkeys(resolved))
+
+
+def analyze(
+    text: str,
+    modes: list[str],
+    settings: dict = None,
+    cache: "ResultCache" = None,
+    session: "DocumentSession" = None,
+    metrics: Metrics = None,
+    budget: Budget = None,
+) -> dict:
+    """
+    执行多个分析模式，共享一次解析与一次遍历的结果。
+
+    提供缓存时先按源码哈希查找，全部命中则完全不解析源码。
+    cache 与 session 只由调用方传入，本模块不导入它们，保持诊断路径的导入开销最小。
+
+    :param text: 源码文本
+    :param modes: 分析模式列表
+    :param settings: pycodejojo.* 开关，关闭的规则不会出现在结果中
+    :param cache: 结果缓存
+    :param session: 文本对应的文档会话，提供时使用增量结果
+    :param metrics: 各阶段耗时与计数
+    :param budget: 时间与大小预算，超出时返回部分结果并设置 budget.truncated，
+        部分结果不会写入缓存
+    :return: 以模式名为键的结果字典
+    """
+    result = dict(iter_analyze(text, modes, settings, cache, session, metrics, budget))
+    return {mode: result[mode] for mode in modes if mode in result}
+
+
+def iter_analyze(
+    text: str,
+    modes: list[str],
+    settings: dict = None,
+    cache: "ResultCache" = None,
+    session: "DocumentSession" = None,
+    metrics: Metrics = None,
+    budget: Budget = None,
+):
+    """
+    与 analyze 相同，但每个模式得到结果后立即产生 (模式名, 结果)：
+    缓存命中的模式最先产生，其余模式按规则完成的先后产生。
+    """
+    metrics = metrics or Metrics(enabled=False)
+    if budget is not None and budget.cancelled:
+        return
+    engine = RuleEngine(settings)
+    modes = [mode for mode in modes if engine.is_enabled(mode)]
+    metrics.count("source_chars", len(text))
+
+    missing = modes
+    if cache is not None:
+        with metrics.phase("cache"):
+            digest = cache.digest(text)
+            missing = []
+            hits = []
+            for mode in modes:
+                value = cache.get(digest, engine.cache_key(mode))
+                if value is None:
+                    missing.append(mode)
+                else:
+                    hits.append((mode, value))
+        metrics.count("cache_hits", len(hits))
+        yield from hits
+
+    if not missing:
+        return
+    source = budget.limit_source(text) if budget is not None else text
+    if session is not None and source is text:
+        with metrics.phase("session"):
+            computed = session.results(missing, settings, budget)
+        computed = computed.items()
+    else:
+        with metrics.phase("parse"):
+            myRange = Range(source)
+        if metrics.enabled and myRange._tree is not None:
+            metrics.count("nodes", sum(1 for _ in ast.walk(myRange._tree)))
+        computed = engine.iter_run(myRange, missing, metrics, budget)
+    for mode, value in computed:
+        if cache is not None and not (budget is not None and budget.truncated):
+            cache.put(digest, engine.cache_key(mode), value)
+        yield mode, value
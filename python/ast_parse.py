@@ -1,5 +1,148 @@
 import ast
 import re
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Union
+
+
+# Python 解析器只把 \r\n、\r、\n 视为换行，与 str.splitlines 不同
+_NEWLINE_RE = re.compile(r"\r\n|\r|\n")
+# UTF-16 中需要两个编码单元表示的字符（BMP 之外）
+_ASTRAL_RE = re.compile("[\U00010000-\U0010FFFF]")
+# import 语句以及类、函数定义在名称之前的部分只会包含标识符、点、逗号、
+# 括号、续行符与注释，跳过注释后剩下的标识符即 tokenize 中的 NAME token
+_NAME_TOKEN_RE = re.compile(r"#[^\r\n]*|(?P<name>[^\W\d]\w*)")
+
+# 这些基类不要求子类的 __init__ 调用父类初始化方法，可通过
+# superInitExemptBases 选项覆盖
+DEFAULT_SUPER_INIT_EXEMPT_BASES = [
+    "object",
+    "ABC",
+    "Protocol",
+    "Generic",
+    "Exception",
+    "BaseException",
+    "NamedTuple",
+    "TypedDict",
+]
+
+# 构成作用域的定义节点
+_SCOPE_TYPES = (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def handles(*node_types: type):
+    """
+    标记 Range 的节点处理函数所关心的 AST 节点类型，供单次遍历调度使用。
+
+    :param node_types: AST 节点类型
+    """
+
+    def decorator(func):
+        func.node_types = node_types
+        return func
+
+    return decorator
+
+
+def _timed(handler, timings: dict):
+    """
+    包装节点处理函数，把耗时累加到 timings[handler.__name__]。
+    """
+    name = handler.__name__
+    clock = time.perf_counter
+
+    def wrapper(self, node):
+        start = clock()
+        handler(self, node)
+        timings[name] = timings.get(name, 0.0) + clock() - start
+
+    return wrapper
+
+
+def _normalize_name(name: str) -> str:
+    """
+    按 NFKC 规范化源码中的标识符，与 ast 中的名称一致，如 ﬁle 与 file。
+    """
+    if name.isascii():
+        return name
+    # 只有非 ASCII 标识符才需要，按需导入
+    import unicodedata
+
+    return unicodedata.normalize("NFKC", name)
+
+
+def _astral_offsets(text: str) -> array:
+    """
+    构建文本中 BMP 之外字符的索引表，这些字符在 UTF-16 中占两个编码单元。
+    """
+    if text.isascii():
+        return array("q")
+    return array("q", (m.start() for m in _ASTRAL_RE.finditer(text)))
+
+
+def _index_of_astral(astral: array, offset: int) -> int:
+    """
+    根据 _astral_offsets 的索引表，将 UTF-16 偏移转换为字符索引。
+    """
+    # 第 k 个 BMP 之外字符的 UTF-16 偏移为其字符索引加 k，
+    # 二分查找偏移之前有多少个这样的字符
+    lo, hi = 0, len(astral)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if astral[mid] + mid < offset:
+            lo = mid + 1
+        else:
+            hi = mid
+    return offset - lo
+
+
+def _base_name(node: ast.expr) -> str:
+    """
+    获取基类表达式的名称：Base、module.Base 与 Generic[T] 分别得到
+    Base、Base 与 Generic，其他表达式返回 None。
+    """
+    if isinstance(node, ast.Subscript):
+        node = node.value
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _calls_super_init(func: ast.FunctionDef, bases: set) -> bool:
+    """
+    判断构造函数中是否调用了父类初始化方法，只检查函数自身的语句，
+    不进入嵌套的函数与类，代价与构造函数的节点数成正比。
+
+    支持 super().__init__()、super(Cls, self).__init__() 以及
+    Base.__init__(self)，字符串与注释中的文本不会被当作调用。
+
+    :param func: __init__ 函数定义节点
+    :param bases: 类的基类名称
+    """
+    stack = list(func.body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "__init__"
+        ):
+            owner = node.func.value
+            if (
+                isinstance(owner, ast.Call)
+                and isinstance(owner.func, ast.Name)
+                and owner.func.id == "super"
+            ):
+                return True
+            if _base_name(owner) in bases:
+                return True
+        stack.extend(ast.iter_child_nodes(node))
+    return False
 
 
 class Range:
@@ -7,33 +150,111 @@ class Range:
     解析 Python 源代码，提取类、导入模块等信息，并提供相关诊断功能。
     """
 
-    def __init__(self, text: str):
+    def __init__(self, text: str, tree: ast.Module = None):
         """
         初始化 Range 对象，解析输入的 Python 源代码。
 
         :param text: Python 源代码字符串
+        :param tree: 已解析好的语法树，提供时不再重复解析 text
         """
         self._text: str = text
         self._tree: ast.AST = None
 
-        self._classes_range_map = {}
-        self._imports_range_map = {}
+        self._build_offset_index()
+        self._reset_results()
+
+        # 以 id(node) 为键缓存 Attribute 节点的属性路径
+        self._attr_paths = {}
+
+        # 作用域索引，只在有规则需要时才构建
+        self._scope_starts = None
+        # 以 id(node) 为键缓存定义节点名称的字符索引区间
+        self._name_spans = {}
+        # 影响规则结果的选项，如 superInitExemptBases
+        self._options = {}
+
+        if tree is not None:
+            self._tree = tree
+            return
 
         try:
             self._tree = ast.parse(text)
-            self._add_parent_for_node(self._tree)
-        except SyntaxError as e:
+        except (SyntaxError, RecursionError) as e:
             ...
 
-    def _add_parent_for_node(self, node: ast.AST, parent=None) -> None:
+    def _reset_results(self) -> None:
+        """
+        清空所有规则的结果。使用新的容器而不是原地清空，已返回给调用方的结果不受影响。
+        """
+        self._classes_range_map = {}
+        self._imports_range_map = {}
+        self._super_init_ranges = []
+        self._loop_conflict_ranges = []
+        self._attr_index = {}
+        self._color_literals = None
+
+        # 已经在整棵树上执行过的节点处理函数，结果在多个诊断之间共享
+        self._dispatched = set()
+
+        # 遍历被预算打断时为 True，此时的结果只是部分结果
+        self.truncated = False
+        self._budget = None
+
+    def _begin(self, budget=None, options: dict = None) -> None:
         """
-        为 AST 节点添加父节点引用。方便直接访问父节点。
+        开始一轮规则执行。上一轮被打断的部分结果，或在不同选项下得到的结果
+        会被丢弃，本轮重新计算。
 
-        :param node: AST 节点
+        :param budget: 带有 exhausted() 方法的预算对象，None 表示不限制
+        :param options: 影响规则结果的选项
         """
-        node.parent = parent
-        for child in ast.iter_child_nodes(node):
-            self._add_parent_for_node(child)
+        options = options or {}
+        if self.truncated or options != self._options:
+            self._reset_results()
+        self._options = options
+        self._budget = budget
+
+    def _build_scope_index(self) -> None:
+        """
+        构建类与函数定义的区间表，按起始位置排序，并记录外层作用域的下标。
+        """
+        starts, ends, scopes, outers = [], [], [], []
+        # 栈中保存 (节点, 外层作用域下标)，按源码顺序先序遍历
+        stack = [(self._tree, -1)]
+        while stack:
+            node, outer = stack.pop()
+            if isinstance(node, _SCOPE_TYPES):
+                starts.append((node.lineno, node.col_offset))
+                ends.append((node.end_lineno, node.end_col_offset))
+                scopes.append(node)
+                outers.append(outer)
+                outer = len(scopes) - 1
+            children = list(ast.iter_child_nodes(node))
+            stack.extend((child, outer) for child in reversed(children))
+        self._scope_starts = starts
+        self._scope_ends = ends
+        self._scopes = scopes
+        self._scope_outers = outers
+
+    def _enclosing_scopes(self, node: ast.AST):
+        """
+        由内向外依次返回包含该节点的类或函数定义，通过二分查找定位最内层作用域。
+
+        :param node: 带位置信息的 AST 节点
+        :return: 作用域节点生成器
+        """
+        if self._tree is None:
+            return
+        if self._scope_starts is None:
+            self._build_scope_index()
+        pos = (node.lineno, node.col_offset)
+        i = bisect_right(self._scope_starts, pos) - 1
+        # 区间互相嵌套，包含 pos 的作用域只可能是 i 或 i 的外层
+        while i >= 0:
+            scope = self._scopes[i]
+            if scope is not node and pos < self._scope_ends[i]:
+                yield scope
+            i = self._scope_outers[i]
 
     def get_classes_without_parent_init_call(self) -> list[dict[str, tuple[int, int]]]:
         """
@@ -44,47 +265,133 @@ class Range:
         if self._tree is None:
             return []
 
-        ranges = []
-        for node in ast.walk(self._tree):  # 遍历 AST 节点
-            if isinstance(node, ast.ClassDef):
-                if node.bases:
-                    # 遍历类中的所有函数
-                    for func in node.body:
-                        s = self.index_of_text(func.lineno, func.col_offset)
-                        e = self.index_of_text(func.end_lineno, func.end_col_offset)
-                        if (
-                            isinstance(func, ast.FunctionDef)
-                            and func.name == "__init__"
-                        ):
-                            # 检查是否调用了父类初始化方法
-                            if re.search(
-                                r"super\s*\(\s*\)\s*\.\s*__init__\s*\(.*?\)",
-                                self._text[s:e],
-                                re.DOTALL,
-                            ):
-                                break
-                            else:
-                                class_idx_start = self.index_of_text(
-                                    node.lineno, node.col_offset
-                                )
-                                func_idx_start = self.index_of_text(
-                                    func.lineno, func.col_offset
-                                )
-
-                                class_s = self._text.find(node.name, class_idx_start)
-                                class_e = class_s + len(node.name)
-
-                                func_s = self._text.find(func.name, func_idx_start)
-                                func_e = func_s + len(func.name)
-
-                                ranges.append(
-                                    {
-                                        "class": (class_s, class_e),
-                                        "func": (func_s, func_e),
-                                    }
-                                )
-                                break
-        return ranges
+        self._dispatch([Range._check_super_init])
+        return self._super_init_ranges
+
+    @handles(ast.ClassDef)
+    def _check_super_init(self, node: ast.ClassDef) -> None:
+        """
+        检查单个类的构造函数是否调用了父类初始化方法。
+
+        :param node: 类定义节点
+        """
+        bases = {_base_name(base) for base in node.bases}
+        exempt = self._options.get(
+            "superInitExemptBases", DEFAULT_SUPER_INIT_EXEMPT_BASES
+        )
+        if not bases or bases <= set(exempt):
+            return
+        # 遍历类中的所有函数
+        for func in node.body:
+            if isinstance(func, ast.FunctionDef) and func.name == "__init__":
+                # 检查是否调用了父类初始化方法
+                if _calls_super_init(func, bases):
+                    return
+
+                self._super_init_ranges.append(
+                    {
+                        "class": self._span(*self._name_span(node)),
+                        "func": self._span(*self._name_span(func)),
+                    }
+                )
+                return
+
+    def get_for_loop_variable_conflicts(self) -> list[dict[str, tuple[int, int]]]:
+        """
+        获取循环变量与其迭代对象中的名称重名的位置，包括 for、async for
+        与推导式中的 for 子句。
+
+        :return: 包含循环变量和迭代对象中同名名称范围的列表
+        """
+        if self._tree is None:
+            return []
+
+        self._dispatch([Range._check_loop_variable])
+        return self._loop_conflict_ranges
+
+    @handles(ast.For, ast.AsyncFor, ast.comprehension)
+    def _check_loop_variable(self, node: Union[ast.For, ast.AsyncFor, ast.comprehension]) -> None:
+        """
+        检查循环的目标中是否有名称同时出现在迭代对象中，如 for x in x、
+        for k, v in v.items()，目标可以是元组、列表或带星号的解包。
+
+        :param node: for 循环或推导式中的 for 子句
+        """
+        targets = {}
+        stack = [node.target]
+        while stack:
+            target = stack.pop()
+            if isinstance(target, ast.Name):
+                targets.setdefault(target.id, target)
+            elif isinstance(target, (ast.Tuple, ast.List)):
+                stack.extend(target.elts)
+            elif isinstance(target, ast.Starred):
+                stack.append(target.value)
+        if not targets:
+            return
+
+        # 迭代对象中的 lambda 与推导式有自己的作用域，其中的同名变量不算冲突
+        stack = [node.iter]
+        while stack:
+            expr = stack.pop()
+            if isinstance(
+                expr,
+                (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp),
+            ):
+                continue
+            if isinstance(expr, ast.Name) and expr.id in targets:
+                self._loop_conflict_ranges.append(
+                    {
+                        "variable": self._node_span(targets[expr.id]),
+                        "iterable": self._node_span(expr),
+                    }
+                )
+                continue
+            stack.extend(ast.iter_child_nodes(expr))
+
+    def _node_span(self, node: ast.expr) -> tuple[int, int]:
+        """
+        获取表达式节点的 UTF-16 偏移区间。
+        """
+        return self._span(
+            self.index_of_text(node.lineno, node.col_offset),
+            self.index_of_text(node.end_lineno, node.end_col_offset),
+        )
+
+    def _dispatch(self, handlers, timings: dict = None) -> None:
+        """
+        在一次 AST 遍历中把节点分发给所有尚未执行过的处理函数。
+
+        :param handlers: 由 handles 标记过的 Range 处理函数
+        :param timings: 提供时按处理函数名累加耗时（秒）
+        """
+        if self._tree is None:
+            return
+        table = {}
+        for handler in handlers:
+            if handler in self._dispatched:
+                continue
+            self._dispatched.add(handler)
+            timed = handler if timings is None else _timed(handler, timings)
+            for node_type in handler.node_types:
+                table.setdefault(node_type, []).append(timed)
+        if not table:
+            return
+        budget = self._budget
+        # 按源码顺序（先序）遍历，同名结果以文件中最后出现的为准
+        stack = [self._tree]
+        visited = 0
+        while stack:
+            # 每隔一批节点检查一次时间预算与取消状态
+            if budget is not None and not visited & 0xFF and budget.exhausted():
+                self.truncated = True
+                budget.truncated = True
+                return
+            visited += 1
+            node = stack.pop()
+            for handler in table.get(type(node), ()):
+                handler(self, node)
+            stack.extend(reversed(list(ast.iter_child_nodes(node))))
 
     def get_modules_with_name_conflicts(self) -> list[dict[str, tuple[int, int]]]:
         """
@@ -105,89 +412,223 @@ class Range:
             if name in self._classes_range_map
         ]
 
+    def _build_offset_index(self) -> None:
+        """
+        构建行首偏移表及 UTF-16 代理对位置表，供偏移换算使用。
+        """
+        text = self._text
+        self._is_ascii = text.isascii()
+        # 每一行行首的字符索引，下标 i 对应第 i + 1 行
+        self._line_starts = array("q", [0])
+        self._line_starts.extend(m.end() for m in _NEWLINE_RE.finditer(text))
+        # BMP 之外字符的索引，这些字符在 UTF-16 中占两个编码单元
+        self._astral_offsets = _astral_offsets(text)
+
+    def _line_text(self, lineno: int) -> str:
+        """
+        获取指定行的文本（不含换行符之后的内容）。
+
+        :param lineno: 行号，从 1 开始
+        :return: 行文本
+        """
+        start = self._line_starts[lineno - 1]
+        if lineno < len(self._line_starts):
+            return self._text[start : self._line_starts[lineno]]
+        return self._text[start:]
+
     def index_of_text(self, lineno: int, col_offset: int) -> int:
         """
         根据行号和列偏移计算字符索引。
 
         :param lineno: 行号
-        :param col_offset: 列偏移
+        :param col_offset: 列偏移（AST 中的 UTF-8 字节偏移）
         :return: 字符索引
         """
-        lines = self._text.splitlines(keepends=True)
-        index = 0
-        for i in range(lineno - 1):  # 行号从 1 开始
-            index += len(lines[i])
-        index += col_offset
-        return index
+        index = self._line_starts[lineno - 1]  # 行号从 1 开始
+        if self._is_ascii:
+            return index + col_offset
+        line = self._line_text(lineno)
+        if line.isascii():
+            return index + col_offset
+        return index + len(
+            line.encode("utf-8")[:col_offset].decode("utf-8", errors="ignore")
+        )
+
+    def position_of_index(self, index: int) -> tuple[int, int]:
+        """
+        根据字符索引计算行号和列偏移，是 index_of_text 的逆运算。
 
-    def get_all_attr(self) -> list[dict]:
+        :param index: 字符索引
+        :return: (行号, 列偏移)，列偏移为 UTF-8 字节偏移
         """
-        获取文件中所有的属性调用及其调用轨迹，包括所属的类信息。
+        lineno = bisect_right(self._line_starts, index)
+        start = self._line_starts[lineno - 1]
+        segment = self._text[start:index]
+        if segment.isascii():
+            return lineno, len(segment)
+        return lineno, len(segment.encode("utf-8"))
+
+    def _names_from(self, index: int):
+        """
+        从字符索引处开始按词法规则扫描，依次产生标识符的 (名称, 起始索引, 结束索引)，
+        名称经过 NFKC 规范化，可直接与 ast 中的名称比较。
 
-        :return: 包含属性调用信息的字典列表
+        index 必须位于语句开头等不在字符串或注释中的位置，扫描只进行到调用方
+        找到所需名称为止，代价与语句头部的长度成正比。
+
+        :param index: 字符索引
         """
-        if self._tree is None:
-            return []
+        for m in _NAME_TOKEN_RE.finditer(self._text, index):
+            if m.lastgroup == "name":
+                yield _normalize_name(m.group()), m.start(), m.end()
 
-        attr_calls = []
+    def _name_span(self, node: Union[ast.ClassDef, ast.FunctionDef]) -> tuple[int, int]:
+        """
+        获取类或函数定义中名称的字符索引区间，结果由各规则共享。
+        名称之前只有 class、def、async 关键字，找不到时返回定义起点的空区间。
+        """
+        span = self._name_spans.get(id(node))
+        if span is None:
+            start = self.index_of_text(node.lineno, node.col_offset)
+            span = (start, start)
+            for name, s, e in self._names_from(start):
+                if name == node.name:
+                    span = (s, e)
+                    break
+                if name not in ("class", "def", "async"):
+                    break
+            self._name_spans[id(node)] = span
+        return span
+
+    def utf16_offset(self, index: int) -> int:
+        """
+        将字符索引转换为 VS Code positionAt 所需的 UTF-16 偏移。
 
-        def traverse_node(node):
-            """递归遍历AST节点，收集属性调用"""
-            # 如果是属性访问节点，提取完整的属性路径
-            if isinstance(node, ast.Attribute):
-                attr_path = self.get_attr(node)
-                if attr_path:
-                    # 查找该属性所属的类
-                    parent_class = self._find_parent_class(node)
-
-                    # 创建包含属性路径和父类信息的字典
-                    attr_info = {
-                        "path": attr_path,
-                        "line": node.lineno,
-                        "col": node.col_offset,
-                    }
+        :param index: 字符索引
+        :return: UTF-16 偏移
+        """
+        if not self._astral_offsets:
+            return index
+        return index + bisect_left(self._astral_offsets, index)
+
+    def index_of_utf16(self, offset: int) -> int:
+        """
+        将 VS Code 的 UTF-16 偏移转换为字符索引，是 utf16_offset 的逆运算。
+
+        :param offset: UTF-16 偏移
+        :return: 字符索引
+        """
+        return _index_of_astral(self._astral_offsets, offset)
+
+    def _span(self, start: int, end: int) -> tuple[int, int]:
+        """
+        将字符索引区间转换为 UTF-16 偏移区间。
+        """
+        return self.utf16_offset(start), self.utf16_offset(end)
 
-                    if parent_class:
-                        attr_info["parent_class"] = parent_class
+    def get_all_attr(self) -> list[dict]:
+        """
+        获取文件中所有的属性调用及其调用轨迹，包括所属的类信息。
 
-                    # 避免重复添加
-                    if not any(info["path"] == attr_path for info in attr_calls):
-                        attr_calls.append(attr_info)
+        每个属性路径只出现一次，line / col / parent_class 取第一次出现的位置，
+        occurrences 记录所有出现位置的 UTF-16 偏移区间。
 
-            # 递归处理所有子节点
-            for child in ast.iter_child_nodes(node):
-                traverse_node(child)
+        :return: 包含属性调用信息的字典列表
+        """
+        self._dispatch([Range._scan_attr])
+        return list(self._attr_index.values())
 
-        # 从AST根节点开始遍历
-        traverse_node(self._tree)
-        return attr_calls
+    def get_color_literals(self) -> list[list]:
+        """
+        获取字符串与数字元组中的颜色字面量，基于 token 而不是语法树，
+        因此源码存在语法错误时仍能返回出错位置之前的结果。
+
+        :return: [起始, 结束, r, g, b, a, 格式] 列表，起止为 UTF-16 偏移
+        """
+        if self._color_literals is None:
+            # tokenize 只有这个模式需要，按需导入
+            from color_scan import scan_colors
+
+            colors, complete = scan_colors(self._text, self._budget)
+            if not complete:
+                self.truncated = True
+                self._budget.truncated = True
+            self._color_literals = [
+                [*self._span(start, end), *rest] for start, end, *rest in colors
+            ]
+        return self._color_literals
+
+    @handles(ast.Attribute)
+    def _scan_attr(self, node: ast.Attribute) -> None:
+        attr_path = self._attr_path(node)
+        if not attr_path:
+            return
+        s = self.index_of_text(node.lineno, node.col_offset)
+        e = self.index_of_text(node.end_lineno, node.end_col_offset)
+        attr_info = self._attr_index.get(attr_path)
+        if attr_info is None:
+            # 创建包含属性路径和父类信息的字典
+            attr_info = {
+                "path": attr_path,
+                "line": node.lineno,
+                "col": node.col_offset,
+            }
+            # 查找该属性所属的类
+            parent_class = self._find_parent_class(node)
+            if parent_class:
+                attr_info["parent_class"] = parent_class
+            attr_info["occurrences"] = []
+            self._attr_index[attr_path] = attr_info
+        attr_info["occurrences"].append(self._span(s, e))
 
     def get_attr(self, node: ast.AST) -> str:
         """
-        递归构建属性访问的完整路径。
+        构建属性访问的完整路径。
 
         :param node: AST节点
         :return: 属性访问的完整路径字符串
         """
-        if isinstance(node, ast.Attribute):
-            # 递归获取父属性路径
-            parent_attr = self.get_attr(node.value)
-            if parent_attr and node.attr != "setter":
-                return f"{parent_attr}.{node.attr}"
+        return self._attr_path(node)
+
+    def _attr_path(self, node: ast.AST) -> str:
+        """
+        迭代构建属性访问的完整路径，Attribute 节点的结果会被缓存，
+        遍历属性链时内层节点不会重复计算。
+        """
+        # 沿属性链向下找到第一个已缓存或不再构成链的节点
+        chain = []
+        while id(node) not in self._attr_paths:
+            if isinstance(node, ast.Attribute):
+                chain.append(node)
+                node = node.value
+            elif isinstance(node, ast.Call):
+                # 处理函数调用情况
+                chain.append(node)
+                node = node.func
+            elif isinstance(node, ast.Subscript):
+                # 处理下标访问情况，如 obj['key'] 或 arr[0]
+                chain.append(node)
+                node = node.value
             else:
-                return node.attr
+                break
+
+        if id(node) in self._attr_paths:
+            path = self._attr_paths[id(node)]
         elif isinstance(node, ast.Name):
-            return node.id
-        elif isinstance(node, ast.Call):
-            # 处理函数调用情况
-            return self.get_attr(node.func)
-        elif isinstance(node, ast.Subscript):
-            # 处理下标访问情况，如 obj['key'] 或 arr[0]
-            base = self.get_attr(node.value)
-            return base if base else ""
+            path = node.id
         else:
             # 其他类型节点不构成属性路径的一部分
-            return ""
+            path = ""
+
+        # 由内向外拼接路径
+        for link in reversed(chain):
+            if isinstance(link, ast.Attribute):
+                if path and link.attr != "setter":
+                    path = f"{path}.{link.attr}"
+                else:
+                    path = link.attr
+                self._attr_paths[id(link)] = path
+        return path
 
     def _find_parent_class(self, node):
         """
@@ -196,92 +637,71 @@ class Range:
         :param node: AST节点
         :return: 类名或None
         """
-        # 从当前节点开始向上查找
-        current = node
-        while hasattr(current, "parent") and current.parent:
-            current = current.parent
-            if isinstance(current, ast.ClassDef):
-                return current.name
-
-        # 如果通过父节点引用找不到，尝试通过位置关系查找
-        for cls_node in ast.walk(self._tree):
-            if isinstance(cls_node, ast.ClassDef):
-                # 检查节点是否在类定义的范围内
-                if cls_node.lineno <= node.lineno and (
-                    hasattr(cls_node, "end_lineno")
-                    and node.lineno <= cls_node.end_lineno
-                ):
-                    return cls_node.name
-
+        # 从最内层作用域开始向外查找
+        for scope in self._enclosing_scopes(node):
+            if isinstance(scope, ast.ClassDef):
+                return scope.name
         return None
 
-    def _split_by_dot(self, string: str, start: int) -> list[tuple[int, int]]:
-        index_list = []
-        for p in string.split("."):
-            p_len = len(p)
-            index_list.append((start, start + p_len))
-            start += p_len + 1
-        return index_list
-
     def _scan_import_names_range(self) -> None:
-        # 如果树为空，则返回
-        if self._tree is None:
-            return
-        # 遍历树中的每个节点
-        for node in ast.walk(self._tree):
-            # 如果节点是导入或导入自节点
-            if isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
-                # 遍历节点中的每个名称
-                for n in node.names:
-                    name = n.name
-                    # 如果名称不是通配符
-                    if name != "*":
-                        # 获取节点开始和结束的索引
-                        node_start = self.index_of_text(node.lineno, node.col_offset)
-                        node_end = self.index_of_text(
-                            node.end_lineno, node.end_col_offset
-                        )
-                        # 获取节点中的文本
-                        text = self._text[node_start:node_end]
-                        # 获取名称开始和结束的索引
-                        name_start = node_start + text.find(name)
-                        name_end = name_start + len(name)
-                        # 如果名称有别名
-                        if n.asname:
-                            # 如果文本中有别名
-                            if exp := re.search(r"(\s+as\s+)(\w+)", text):
-                                # 获取别名开始和结束的索引
-                                asname_start = name_end + len(exp.group(1))
-                                asname_end = asname_start + len(exp.group(2))
-                                # 将名称和别名添加到导入范围映射中
-                                self._imports_range_map[name] = {
-                                    "name": (
-                                        self._split_by_dot(name, name_start)
-                                        if "." in name
-                                        else [(name_start, name_end)]
-                                    ),
-                                    "asname": (asname_start, asname_end),
-                                }
-                        # 如果名称没有别名
-                        else:
-                            self._imports_range_map[name] = {
-                                "name": (
-                                    self._split_by_dot(name, name_start)
-                                    if "." in name
-                                    else [(name_start, name_end)]
-                                )
-                            }
+        self._dispatch([Range._scan_import_names])
+
+    @handles(ast.Import, ast.ImportFrom)
+    def _scan_import_names(self, node: Union[ast.Import, ast.ImportFrom]) -> None:
+        for alias, parts, asname in self._import_alias_spans(node):
+            self._imports_range_map[alias.name] = {"name": parts}
+            if asname is not None:
+                self._imports_range_map[alias.name]["asname"] = asname
+
+    def _import_alias_spans(self, node: Union[ast.Import, ast.ImportFrom]) -> list:
+        """
+        按顺序定位导入语句中每个 alias 的名称与别名，同一语句中重复导入的
+        同名 alias 各自得到自己的位置。
+
+        :param node: 导入语句节点
+        :return: [(alias, 各段名称的 UTF-16 区间列表, 别名的 UTF-16 区间或 None)]，
+            from x import * 不包含在内
+        """
+        start = self.index_of_text(node.lineno, node.col_offset)
+        end = self.index_of_text(node.end_lineno, node.end_col_offset)
+        names, spans = [], []
+        for m in _NAME_TOKEN_RE.finditer(self._text, start, end):
+            if m.lastgroup:
+                # 源码中的标识符可能与 ast 中 NFKC 规范化后的名称不同
+                names.append(_normalize_name(m.group()))
+                spans.append(m.span())
+        # 跳过 from 子句中的模块名，从 import 关键字之后按顺序查找，
+        # 每个名称与别名都取各自的位置，而不是语句中第一次出现的位置
+        result = []
+        try:
+            i = names.index("import")
+            for n in node.names:
+                if n.name == "*":
+                    continue
+                # 带点的名称逐段定位，如 os.path 分为 os 与 path
+                parts = []
+                for part in n.name.split("."):
+                    i = names.index(part, i + 1)
+                    parts.append(self._span(*spans[i]))
+                asname = None
+                if n.asname:
+                    i = names.index(n.asname, i + 1)
+                    asname = self._span(*spans[i])
+                result.append((n, parts, asname))
+        except ValueError:
+            # 词法扫描与语法树不一致时放弃该语句余下的名称，不影响其他规则
+            pass
+        return result
 
     def _scan_class_names_range(self) -> None:
         """
         提取类名及其在源代码中的范围。
         """
-        for node in ast.walk(self._tree):  # 遍历 AST 节点
-            if isinstance(node, ast.ClassDef):
-                line_start = self.index_of_text(node.lineno, node.col_offset)
-                s = self._text.find(node.name, line_start)
-                e = s + len(node.name)
-                self._classes_range_map[node.name] = (s, e)
+        self._dispatch([Range._scan_class_name])
+
+    @handles(ast.ClassDef)
+    def _scan_class_name(self, node: ast.ClassDef) -> None:
+        self._classes_range_map[node.name] = self._span(*self._name_span(node))
 
     def _scan_from_moudle(self) -> None:
         if self._tree is None:
@@ -0,0 +1,489 @@
+"""
+Python 分析模式的基准测试。
+
+生成确定性的合成源码，分别在进程内和通过 main.py 标准输入端到端计时，
+用 tracemalloc 记录峰值内存，结果写为 JSON，并可与保存的基线比较。
+
+    python benchmark.py --sizes 1000,10000 --output bench.json
+    python benchmark.py --baseline bench.json
+    python benchmark.py --startup --startup-budget-ms 60
+    python benchmark.py --palette 200,400,800
+    python benchmark.py --differential --seed 0 --files 60 --edits 40
+    python benchmark.py --wire-format
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+
+from ast_parse import Range
+from document_session import DocumentSession, _utf16_len
+from rule_engine import ANALYZER_VERSION, RuleEngine
+from wire_format import _ENCODERS, encode_frame, read_frames
+
+
+MAIN_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+_MODULES = ["os", "sys", "json", "re", "ast", "typing", "collections", "functools"]
+_IDENTS = ["value", "数据", "名称", "élan", "größe", "item", "node", "κλάση"]
+
+
+def generate_source(lines: int, seed: int = 0) -> str:
+    """
+    生成确定性的合成 Python 源码，包含深层继承、大量导入与别名、非 ASCII 标识符。
+
+    :param lines: 目标行数（近似）
+    :param seed: 随机种子
+    :return: 源码文本
+    """
+    rng = random.Random(seed)
+    out = ["# -*- coding: utf-8 -*-", '"""合成的基准测试源码 🐍"""', ""]
+    i = 0
+    while len(out) < lines:
+        kind = rng.random()
+        if kind < 0.15:
+            mod = rng.choice(_MODULES)
+            names = ", ".join(
+                f"{rng.choice(_IDENTS)}{i}_{k} as a{i}_{k}"
+                for k in range(rng.randint(1, 4))
+            )
+            out.append(f"from {mod}.sub{i % 7} import {names}")
+            out.append(f"import {mod}.path{i % 5} as {mod}_{i}, {mod}")
+        elif kind < 0.65:
+            # 深层继承链：每个类继承上一个类
+            base = f"C{i - 1}" if i and rng.random() < 0.8 else "object"
+            name = f"C{i}"
+            out.append(f"class {name}({base}):")
+            out.append(f'    """类 {name}，包含非 ASCII 文本：数据 ✓"""')
+            out.append("")
+            out.append(f"    def __init__(self, {rng.choice(_IDENTS)}=None):")
+            if rng.random() < 0.7:
+                out.append("        super().__init__()")
+            for k in range(rng.randint(1, 6)):
+                out.append(f"        self._{rng.choice(_IDENTS)}_{k} = {k}")
+            out.append("")
+            out.append(f"    def method_{i}(self, items):")
+            out.append("        for item in items:")
+            out.append(f"            self.{rng.choice(_IDENTS)}.append(item.value.attr)")
+            out.append("        return [x.y for x in items]")
+            out.append("")
+        else:
+            ident = rng.choice(_IDENTS)
+            out.append(f"def func_{i}({ident}):")
+            out.append(f"    {ident}_结果 = {ident}.get('key', \"值\")")
+            out.append(f"    return {ident}_结果.strip().lower()")
+            out.append("")
+        i += 1
+    return "\n".join(out) + "\n"
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_in_process(text: str, mode: str, repeat: int) -> dict:
+    """
+    在当前进程中计时：解析加单个模式。
+
+    :return: {seconds, peak_bytes}
+    """
+
+    def run():
+        RuleEngine().run(Range(text), [mode])
+
+    seconds = _best_of(run, repeat)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def bench_end_to_end(text: str, mode: str, repeat: int) -> dict:
+    """
+    通过 main.py 的标准输入路径端到端计时，包含解释器启动与 JSON 输出。
+
+    :return: {seconds}
+    """
+    data = text.encode("utf-8")
+
+    def run():
+        subprocess.run(
+            [sys.executable, MAIN_PY, "--mode", mode],
+            input=data,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+
+    return {"seconds": _best_of(run, repeat)}
+
+
+# 诊断模式的启动路径上不应出现的模块，它们只属于取色器、剖析、并行扫描或服务模式
+STARTUP_FORBIDDEN = [
+    "tkinter",
+    "colorsys",
+    "cProfile",
+    "tracemalloc",
+    "concurrent",
+    "multiprocessing",
+    "threading",
+    "queue",
+    "hashlib",
+    "tokenize",
+    "pickle",
+    "logging",
+    "socket",
+]
+
+
+def bench_startup(mode: str = "get_modules_with_name_conflicts") -> dict:
+    """
+    用 python -X importtime 运行 main.py 的诊断模式（空输入），统计导入耗时。
+
+    :param mode: 分析模式
+    :return: {import_ms, modules, forbidden}
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", MAIN_PY, "--mode", mode],
+        input=b"",
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    total = 0
+    modules = []
+    for line in proc.stderr.decode("utf-8", "replace").splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        stripped = name.strip()
+        modules.append(stripped)
+        # 只累加顶层导入，避免重复计算子模块
+        if name[1:2] != " ":
+            total += int(cumulative)
+    forbidden = [name for name in modules if name.split(".")[0] in STARTUP_FORBIDDEN]
+    return {"import_ms": total / 1000, "modules": len(modules), "forbidden": forbidden}
+
+
+def bench_palette(sizes: list[int], repeat: int) -> list[dict]:
+    """
+    取色器色盘的渲染耗时，不经过磁盘缓存，也不需要显示器。
+
+    :return: [{size, seconds}]
+    """
+    # 取色器依赖 tkinter，只在需要时导入
+    from color_picker import render_palette
+
+    results = []
+    for size in sizes:
+        seconds = _best_of(lambda: render_palette(size), repeat)
+        results.append({"size": size, "seconds": seconds})
+        print(f"palette {size:>5} px {seconds * 1000:10.2f} ms", file=sys.stderr)
+    return results
+
+
+# 差分测试中随机插入的片段：类与导入、未闭合的括号与三引号、非 BMP 字符、
+# 装饰器、CRLF 与 __future__ 导入，覆盖分段与增量编辑的边界情况
+_EDIT_SNIPPETS = [
+    "\n",
+    "class os(A):\n    def __init__(self):\n        pass\n",
+    "import os\n",
+    "from a import b as c, d as e\n",
+    "    ",
+    "(",
+    ")",
+    "'''",
+    "é𝒳",
+    "@dec\n",
+    "x = 1; class Q(B): pass\n",
+    "\r\n",
+    "def f():\n    class json: pass\n",
+    "if x:\n",
+    "else:\n",
+    "from __future__ import annotations\n",
+    "color = (1, 2, 3)\n",
+]
+
+
+def _differential_sources(count: int, chars: int = 4000) -> list[tuple[str, str]]:
+    """
+    差分测试的初始文档：标准库源码的开头部分与合成源码，按文件名排序保证可复现。
+
+    :return: [(名称, 源码)]
+    """
+    paths = sorted(glob.glob(os.path.join(os.path.dirname(os.__file__), "*.py")))
+    sources = [("generated", generate_source(200))]
+    for path in paths[: max(count - 1, 0)]:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            # 以非 ASCII 标识符开头，UTF-16 偏移与字符下标从第一行起就不同
+            sources.append((path, "é𝒳 = 1\nimport json\n" + f.read(chars)))
+    return sources
+
+
+def check_differential(seed: int, files: int, edits: int) -> list[str]:
+    """
+    随机编辑差分测试：对每个文档依次应用随机编辑，每次编辑后比较
+    DocumentSession 的增量结果与对编辑后全文重新分析的结果，
+    用于发现 _split / _apply_change 的退化。
+
+    :param seed: 随机种子
+    :param files: 文档数
+    :param edits: 每个文档的编辑次数
+    :return: 不一致的描述列表
+    """
+    rng = random.Random(seed)
+    modes = RuleEngine().names
+    mismatches = []
+    for name, text in _differential_sources(files):
+        session = DocumentSession(text)
+        for step in range(edits):
+            current = session.text
+            start = rng.randint(0, len(current))
+            end = min(len(current), start + rng.choice([0, 0, 1, 3, 10, 50]))
+            inserted = rng.choice(_EDIT_SNIPPETS) if rng.random() < 0.8 else ""
+            offset = _utf16_len(current[:start])
+            change = {
+                "rangeOffset": offset,
+                "rangeLength": _utf16_len(current[:end]) - offset,
+                "text": inserted,
+            }
+            session.apply_changes([change], step)
+            expected_text = current[:start] + inserted + current[end:]
+            if session.text != expected_text:
+                mismatches.append(f"{name} edit {step}: text {change!r}")
+                break
+
+            # 经过 JSON 往返，与通过 main.py 输出的结果比较
+            got = json.loads(json.dumps(session.results(modes)))
+            engine = RuleEngine()
+            full = Range(expected_text)
+            expected = json.loads(
+                json.dumps({mode: engine.run(full, [mode])[mode] for mode in modes})
+            )
+            for mode in modes:
+                if got.get(mode) != expected[mode]:
+                    mismatches.append(f"{name} edit {step}: {mode} {change!r}")
+    return mismatches
+
+
+# 编码往返检查的源码：各模式都有结果，包括有无 as 别名的导入冲突与颜色，
+# 以及各模式结果均为空的源码
+_WIRE_SOURCES = [
+    "import os\nimport json as js, re\nfrom a.b import c as os2\n"
+    "class os: pass\nclass re(Base):\n    def __init__(self):\n        pass\n"
+    "for item in item.items: self.color = (255, 0, 0)\n"
+    "bg = 'rgba(1, 2, 3, 0.5) #fff'\n",
+    "x = 1\n",
+]
+
+
+def check_wire_format() -> list[str]:
+    """
+    对 _ENCODERS 中的每个模式，把结果编码为 compact 与 compact-binary 帧后
+    用 read_frames 解码，检查两者一致，且整数列都是由整数组成的列表。
+
+    :return: 不一致的描述列表
+    """
+    engine = RuleEngine()
+    failures = []
+    for source in _WIRE_SOURCES + [generate_source(200)]:
+        results = engine.run(Range(source), list(_ENCODERS))
+        for mode in _ENCODERS:
+            label = f"{mode} {source[:20]!r}"
+            try:
+                (plain,) = read_frames(encode_frame(mode, results[mode]))
+                (packed,) = read_frames(encode_frame(mode, results[mode], True))
+            except Exception as e:
+                failures.append(f"{label}: {e!r}")
+                continue
+            packed.pop("packed", None)
+            if packed != plain:
+                failures.append(f"{label}: compact-binary differs from compact")
+            for name, column in plain["ints"].items():
+                if not all(isinstance(value, int) for value in column):
+                    failures.append(f"{label}: column {name} is not integers")
+    return failures
+
+
+def run_benchmarks(
+    sizes: list[int], modes: list[str], repeat: int, end_to_end: bool
+) -> dict:
+    """
+    :return: 可写为 JSON 的基准结果
+    """
+    results = []
+    for size in sizes:
+        text = generate_source(size)
+        for mode in modes:
+            record = {"size": size, "mode": mode, "kind": "in_process"}
+            record.update(bench_in_process(text, mode, repeat))
+            results.append(record)
+            print(_format(record), file=sys.stderr)
+            if end_to_end:
+                record = {"size": size, "mode": mode, "kind": "end_to_end"}
+                record.update(bench_end_to_end(text, mode, repeat))
+                results.append(record)
+                print(_format(record), file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "analyzer_version": ANALYZER_VERSION,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _format(record: dict) -> str:
+    text = (
+        f"{record['kind']:<11} {record['mode']:<40} {record['size']:>7} lines "
+        f"{record['seconds'] * 1000:10.2f} ms"
+    )
+    if "peak_bytes" in record:
+        text += f" {record['peak_bytes'] / 1024 / 1024:8.2f} MiB"
+    return text
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    与基线比较，耗时或峰值内存超过 (1 + tolerance) 倍视为退化。
+
+    :return: 退化描述列表
+    """
+    old = {(r["size"], r["mode"], r["kind"]): r for r in baseline["results"]}
+    regressions = []
+    for record in current["results"]:
+        base = old.get((record["size"], record["mode"], record["kind"]))
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if metric in record and base.get(metric):
+                ratio = record[metric] / base[metric]
+                if ratio > 1 + tolerance:
+                    regressions.append(
+                        f"{record['kind']} {record['mode']} {record['size']} lines: "
+                        f"{metric} x{ratio:.2f}"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Python 分析模式基准测试")
+    parser.add_argument(
+        "--sizes", type=str, default="1000,10000,50000", help="逗号分隔的源码行数"
+    )
+    parser.add_argument("--modes", type=str, default="all", help="逗号分隔的模式")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最小值")
+    parser.add_argument("--no-e2e", action="store_true", help="跳过 main.py 端到端计时")
+    parser.add_argument("--output", type=str, default=None, help="结果 JSON 文件")
+    parser.add_argument("--baseline", type=str, default=None, help="基线 JSON 文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的退化比例")
+    parser.add_argument(
+        "--startup", action="store_true", help="只检查 main.py 的启动导入耗时"
+    )
+    parser.add_argument(
+        "--startup-budget-ms", type=float, default=None, help="启动导入耗时上限"
+    )
+    parser.add_argument(
+        "--palette", type=str, default=None, help="逗号分隔的色盘边长，只测色盘渲染"
+    )
+    parser.add_argument(
+        "--differential",
+        action="store_true",
+        help="随机编辑差分测试：比较增量会话与全文分析的结果",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="差分测试的随机种子")
+    parser.add_argument("--files", type=int, default=60, help="差分测试的文档数")
+    parser.add_argument("--edits", type=int, default=40, help="每个文档的编辑次数")
+    parser.add_argument(
+        "--wire-format",
+        action="store_true",
+        help="检查各模式列式编码经 read_frames 解码后的往返一致性",
+    )
+    args = parser.parse_args()
+
+    if args.wire_format:
+        failures = check_wire_format()
+        print(json.dumps({"failures": len(failures)}))
+        for line in failures:
+            print(f"REGRESSION wire-format {line}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+        return
+
+    if args.differential:
+        mismatches = check_differential(args.seed, args.files, args.edits)
+        print(json.dumps({"mismatches": len(mismatches)}))
+        for line in mismatches:
+            print(f"REGRESSION differential {line}", file=sys.stderr)
+        if mismatches:
+            sys.exit(1)
+        return
+
+    if args.palette:
+        sizes = [int(size) for size in args.palette.split(",")]
+        print(json.dumps({"palette": bench_palette(sizes, args.repeat)}))
+        return
+
+    if args.startup:
+        startup = bench_startup()
+        print(json.dumps(startup))
+        failed = False
+        if startup["forbidden"]:
+            print(
+                f"REGRESSION startup imports {', '.join(startup['forbidden'])}",
+                file=sys.stderr,
+            )
+            failed = True
+        budget_ms = args.startup_budget_ms
+        if budget_ms is not None and startup["import_ms"] > budget_ms:
+            print(
+                f"REGRESSION startup import_ms {startup['import_ms']:.1f} > {budget_ms}",
+                file=sys.stderr,
+            )
+            failed = True
+        if failed:
+            sys.exit(1)
+        return
+
+    names = RuleEngine().names
+    modes = names if args.modes == "all" else args.modes.split(",")
+    unknown = [mode for mode in modes if mode not in names]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    current = run_benchmarks(sizes, modes, args.repeat, not args.no_e2e)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    else:
+        print(json.dumps(current))
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import re
+import ast
+import time
+from bisect import bisect_right
+
+
+# 行首不是空白或注释的位置，通常是一条顶层语句的开始
+_TOP_LEVEL_RE = re.compile(r"\n(?=[^\s#])")
+# Python 解析器认可的换行
+_LINE_RE = re.compile(r"\r\n|\r|\n")
+# limit_source 最多尝试解析的前缀数
+_MAX_BACKOFF = 8
+
+
+class Budget:
+    """
+    单次分析请求的时间与源码大小预算，同时承载取消状态。
+
+    预算耗尽或请求被取消时，规则停止遍历并返回部分结果，truncated 被置为 True。
+    """
+
+    def __init__(self, seconds: float = None, max_size: int = None):
+        """
+        :param seconds: 时间预算（秒），None 表示不限制
+        :param max_size: 源码字符数上限，None 表示不限制
+        """
+        self.deadline = time.perf_counter() + seconds if seconds else None
+        self.max_size = max_size
+        self.cancelled = False
+        self.truncated = False
+
+    def cancel(self) -> None:
+        """
+        取消请求，可以在其他线程中调用。
+        """
+        self.cancelled = True
+
+    def exhausted(self) -> bool:
+        if self.cancelled:
+            return True
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def limit_source(self, text: str) -> str:
+        """
+        超出大小预算时截取源码前缀，并尽量在顶层语句的边界处截断。
+
+        行首不是空白的位置也可能位于未闭合的括号、try 之后的 except 或
+        装饰器之后，这样的前缀无法解析，此时退回到更早的边界，
+        最多尝试 _MAX_BACKOFF 次。
+
+        :param text: 源码文本
+        :return: 需要分析的源码
+        """
+        if not self.max_size or len(text) <= self.max_size:
+            return text
+        self.truncated = True
+        prefix = text[: self.max_size]
+        boundaries = [m.end() for m in _TOP_LEVEL_RE.finditer(prefix)]
+        if not boundaries:
+            return ""
+        first = prefix[: boundaries[-1]]
+        # 行首索引，用于把 SyntaxError 的行号换算为位置
+        line_starts = [0] + [m.end() for m in _LINE_RE.finditer(prefix)]
+        i = len(boundaries) - 1
+        for _ in range(_MAX_BACKOFF):
+            candidate = prefix[: boundaries[i]]
+            try:
+                ast.parse(candidate)
+            except SyntaxError as e:
+                # 退回到出错行之前的边界，出错行通常是未闭合结构的开始
+                limit = boundaries[i] - 1
+                if e.lineno and e.lineno <= len(line_starts):
+                    limit = min(limit, line_starts[e.lineno - 1])
+                i = bisect_right(boundaries, limit) - 1
+                if i < 0:
+                    # 第一条顶层语句（如模块文档字符串）就未结束
+                    return ""
+                continue
+            except (ValueError, RecursionError):
+                break
+            return candidate
+        # 找不到可解析的前缀时，基于 token 的规则仍可使用最后的边界
+        return first
+
@@ -1,15 +1,99 @@
+import os
+import sys
+import json
+import time
+import tempfile
 import tkinter
 from tkinter import ttk
 from tkinter import Canvas, Frame, Scale, VERTICAL
 import colorsys
 
 
+# 拖动与滑轨事件的合并间隔（毫秒），每个间隔只处理最新的一次事件
+_FRAME_MS = 16
+
+# 渲染好的色盘按画布尺寸缓存在这里，渲染方式变化时需要修改文件名中的版本号
+PALETTE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "pycodejojo")
+
+
+def render_palette(size: int) -> bytes:
+    """
+    生成色盘图像：横向为色相，纵向为饱和度，亮度为 1。
+
+    亮度为 1 时 hsv_to_rgb 的每个分量都是 1 - s * d，d 只与色相有关，
+    因此按列算好 d，再逐行生成整行像素，结果与逐像素调用 colorsys 相同。
+
+    :param size: 画布边长（像素）
+    :return: 二进制 PPM (P6) 图像数据
+    """
+    # 与 colorsys.hsv_to_rgb 相同的分段方式
+    depths = []
+    for x in range(size):
+        h = x / size
+        i = int(h * 6.0)
+        f = (h * 6.0) - i
+        i = i % 6
+        # 分量 v, q, t, p 分别对应 d = 0, f, 1 - f, 1
+        v, q, t, p = 0.0, f, 1.0 - f, 1.0
+        depths.extend(
+            (
+                (v, t, p),
+                (q, v, p),
+                (p, v, t),
+                (p, q, v),
+                (t, p, v),
+                (v, p, q),
+            )[i]
+        )
+    rows = [b"P6 %d %d 255\n" % (size, size)]
+    for y in range(size):
+        s = y / size
+        rows.append(bytes([int((1.0 - s * d) * 255) for d in depths]))
+    return b"".join(rows)
+
+
+def load_palette(size: int) -> bytes:
+    """
+    读取磁盘上缓存的色盘图像，不存在时渲染并写入缓存。
+
+    :param size: 画布边长（像素）
+    :return: 二进制 PPM 图像数据
+    """
+    path = os.path.join(PALETTE_CACHE_DIR, f"palette-v1-{size}.ppm")
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        pass
+    data = render_palette(size)
+    try:
+        os.makedirs(PALETTE_CACHE_DIR, exist_ok=True)
+        # 先写临时文件再替换，避免多个进程同时写入时读到不完整的文件
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return data
+
+
 class ColorPicker:
-    def __init__(self, init_color=None):
+    def __init__(self, init_color=None, resident=False):
+        """
+        :param init_color: 初始颜色，"#RRGGBB" 或 (r, g, b)
+        :param resident: 常驻模式，窗口创建后先隐藏，由 pick 反复显示
+        """
         self.root = tkinter.Tk()
         self.root.overrideredirect(True)  # 无标题栏
         self.root.attributes("-topmost", True)
-        self._set_window_position()
+        self._resident = resident
+        # 常驻模式下是否正在取色，避免隐藏窗口时重复结束同一次取色
+        self._picking = False
+        if resident:
+            self.root.withdraw()
+        else:
+            self._set_window_position()
         self.bg_color = "#333333"
 
         self.root.configure(bg=self.bg_color)  # 深色背景
@@ -42,6 +126,18 @@ class ColorPicker:
             background=[("active", "#434c5e"), ("pressed", "#4c566a")],
             foreground=[("disabled", "#888")],
         )
+        # HEX 显示时使用绿色字体，样式只在这里创建一次
+        style.configure(
+            "Green.TButton",
+            foreground="#56f600",
+            background="#3b4252",
+            font=self.font_family_bold,
+        )
+        style.map(
+            "Green.TButton",
+            background=[("active", "#434c5e"), ("pressed", "#4c566a")],
+            foreground=[("disabled", "#888")],
+        )
 
         # HSV色彩空间
         self.hue = 0
@@ -123,13 +219,20 @@ class ColorPicker:
         )
         self.display_btn.grid(row=0, column=1, sticky="w", pady=(0, 0))
 
-        # 记录当前按钮颜色模式，避免重复设置
-        self._last_btn_style = None
+        # 上一次显示的 (RGB, 显示模式)，没有变化时跳过控件更新
+        self._last_preview = None
+        # 等待合并处理的鼠标位置与亮度，以及已安排的 after 任务
+        self._pending_xy = None
+        self._pending_val = None
+        self._after_id = None
 
         # 鼠标离开整个窗口时自动输出并关闭
         self.root.bind("<FocusOut>", self._on_leave)
         self.root.bind("<Leave>", self._on_leave_window)
 
+        if resident:
+            return
+
         # 初始化颜色
         if init_color:
             self._set_color_from_input(init_color)
@@ -141,25 +244,51 @@ class ColorPicker:
     def get_result(self):
         return self._result
 
-    def _set_window_position(self):
-        # 获取当前鼠标位置
-        try:
-            x = self.root.winfo_pointerx()
-            y = self.root.winfo_pointery()
-        except Exception:
-            x, y = 100, 100
+    def pick(self, init_color=None, x=None, y=None):
+        """
+        常驻模式下的一次取色：在鼠标附近（或指定坐标）显示窗口，
+        取色结束后隐藏窗口并返回结果。Tk、样式与色盘在多次取色间复用。
+
+        :param init_color: 初始颜色，省略时沿用上一次的颜色
+        :param x: 窗口横坐标，省略时使用鼠标位置
+        :param y: 窗口纵坐标，省略时使用鼠标位置
+        :return: 与 get_result 相同格式的颜色
+        """
+        self._result = None
+        if init_color:
+            self._set_color_from_input(init_color)
+        else:
+            self._update_preview()
+        self._set_window_position(x, y)
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
+        self._picking = True
+        # _print_color_and_destroy 调用 quit 后 mainloop 返回，窗口保留
+        self.root.mainloop()
+        return self._result
+
+    def close(self):
+        self.root.destroy()
+
+    def _set_window_position(self, x=None, y=None):
+        if x is None or y is None:
+            # 获取当前鼠标位置
+            try:
+                x = self.root.winfo_pointerx()
+                y = self.root.winfo_pointery()
+            except Exception:
+                x, y = 100, 100
         self.root.geometry(f"+{x}+{y}")
 
     def _draw_color_palette(self):
-        size = self.canvas_size
-        self.palette_img = tkinter.PhotoImage(width=size, height=size)
-        for x in range(size):
-            h = x / size
-            for y in range(size):
-                s = y / size
-                r, g, b = colorsys.hsv_to_rgb(h, s, 1)
-                color = "#%02x%02x%02x" % (int(r * 255), int(g * 255), int(b * 255))
-                self.palette_img.put(color, (x, y))
+        # 整幅图像一次性交给 Tk，而不是逐像素调用 put
+        start = time.perf_counter()
+        self.palette_img = tkinter.PhotoImage(
+            data=load_palette(self.canvas_size), format="PPM"
+        )
+        # 色盘渲染耗时（毫秒），用于确认更大或高 DPI 的画布仍然足够快
+        self.palette_render_ms = (time.perf_counter() - start) * 1000
         self.color_canvas.create_image(0, 0, anchor="nw", image=self.palette_img)
         self.selector = self.color_canvas.create_oval(
             0, 0, 10, 10, outline="#000", width=2
@@ -168,43 +297,50 @@ class ColorPicker:
     def _on_palette_click(self, event):
         x = min(max(event.x, 0), self.canvas_size - 1)
         y = min(max(event.y, 0), self.canvas_size - 1)
-        self.hue = x / self.canvas_size
-        self.sat = y / self.canvas_size
-        self.color_canvas.coords(self.selector, x - 5, y - 5, x + 5, y + 5)
-        self._update_preview()
+        self._pending_xy = (x, y)
+        self._schedule_flush()
 
     def _on_value_change(self, val):
-        self.val = float(val)
+        self._pending_val = float(val)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        # 高回报率鼠标每帧会产生多个事件，只安排一次处理
+        if self._after_id is None:
+            self._after_id = self.root.after(_FRAME_MS, self._flush_events)
+
+    def _flush_events(self):
+        """
+        处理合并后的最新鼠标位置与亮度。
+        """
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self._pending_xy is not None:
+            x, y = self._pending_xy
+            self._pending_xy = None
+            self.hue = x / self.canvas_size
+            self.sat = y / self.canvas_size
+            self.color_canvas.coords(self.selector, x - 5, y - 5, x + 5, y + 5)
+        if self._pending_val is not None:
+            self.val = self._pending_val
+            self._pending_val = None
         self._update_preview()
 
     def _update_preview(self):
         r, g, b = colorsys.hsv_to_rgb(self.hue, self.sat, self.val)
         r, g, b = int(r * 255), int(g * 255), int(b * 255)
+        if self._last_preview == ((r, g, b), self.display_mode):
+            return
+        self._last_preview = ((r, g, b), self.display_mode)
         color = "#%02x%02x%02x" % (r, g, b)
         self.preview.config(bg=color)
-        rgb_text = f"R: {r:3d}  G: {g:3d}  B: {b:3d}"
-        hex_text = f"{color.upper()}"
         if self.display_mode == "rgb":
+            rgb_text = f"R: {r:3d}  G: {g:3d}  B: {b:3d}"
             self.display_btn.config(text=rgb_text, style="TButton")
         else:
             # 切换为绿色字体的自定义样式
-            if self._last_btn_style != "Green.TButton":
-                style = ttk.Style(self.root)
-                style.configure(
-                    "Green.TButton",
-                    foreground="#56f600",
-                    background="#3b4252",
-                    font=self.font_family_bold,
-                )
-                style.map(
-                    "Green.TButton",
-                    background=[("active", "#434c5e"), ("pressed", "#4c566a")],
-                    foreground=[("disabled", "#888")],
-                )
-                self._last_btn_style = "Green.TButton"
-            self.display_btn.config(text=hex_text, style="Green.TButton")
-        if self.display_mode == "rgb":
-            self._last_btn_style = "TButton"
+            self.display_btn.config(text=color.upper(), style="Green.TButton")
 
     def _toggle_display_mode(self):
         self.display_mode = "hex" if self.display_mode == "rgb" else "rgb"
@@ -226,13 +362,22 @@ class ColorPicker:
             self._print_color_and_destroy()
 
     def _print_color_and_destroy(self):
+        if self._resident and not self._picking:
+            return
+        # 先处理尚未合并的事件，结果以最后一次拖动为准
+        self._flush_events()
         r, g, b = colorsys.hsv_to_rgb(self.hue, self.sat, self.val)
         r, g, b = int(r * 255), int(g * 255), int(b * 255)
         if self.display_mode == "hex":
             self._result = f"#{r:02X}{g:02X}{b:02X}"
         else:
             self._result = f"rgb({r}, {g}, {b})"
-        self.root.destroy()
+        if self._resident:
+            self._picking = False
+            self.root.withdraw()
+            self.root.quit()
+        else:
+            self.root.destroy()
 
     def _set_color_from_input(self, color):
         # 支持 "#RRGGBB" 或 (r,g,b) 或 "RRGGBB"
@@ -260,6 +405,38 @@ class ColorPicker:
         self._update_preview()
 
 
+def serve_picks(stdin=None, stdout=None) -> None:
+    """
+    常驻取色模式：只创建一次窗口，之后每读到一行 JSON 请求就显示一次取色窗口。
+
+    请求形如 {"id": 1, "color": "#RRGGBB" 或 [r, g, b], "x": 100, "y": 100}，
+    color、x、y 均可省略；响应形如 {"id": 1, "result": "rgb(255, 136, 0)"}。
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    picker = ColorPicker(resident=True)
+    try:
+        for line in stdin:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {"id": None, "error": f"invalid request: {e}"}
+            else:
+                try:
+                    result = picker.pick(
+                        request.get("color"), request.get("x"), request.get("y")
+                    )
+                    response = {"id": request.get("id"), "result": result}
+                except Exception as e:
+                    response = {"id": request.get("id"), "error": repr(e)}
+            stdout.write(json.dumps(response) + "\n")
+            stdout.flush()
+    finally:
+        picker.close()
+
+
 if __name__ == "__main__":
     # ColorPicker("#dfdfff")
     picker = ColorPicker((255, 136, 0))
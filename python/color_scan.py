@@ -0,0 +1,255 @@
+import io
+import re
+import token
+import keyword
+import tokenize
+
+
+# 字符串中的 rgb(...) / rgba(...) 与 #RGB / #RRGGBB / #RRGGBBAA
+_STRING_COLOR_RE = re.compile(
+    r"(?P<func>rgba?)\(\s*(?P<r>\d{1,3})\s*,\s*(?P<g>\d{1,3})\s*,\s*(?P<b>\d{1,3})"
+    r"\s*(?:,\s*(?P<a>\d{1,3}|1|0|0\.\d+)\s*)?\)"
+    r"|#(?P<hex>[0-9A-Fa-f]{8}|[0-9A-Fa-f]{6}|[0-9A-Fa-f]{3})\b"
+)
+# 元组中的颜色分量只接受十进制整数，透明度还可以是 0 到 1 之间的小数
+_CHANNEL_RE = re.compile(r"\d{1,3}")
+_ALPHA_RE = re.compile(r"\d{1,3}|1|0|0\.\d+")
+
+# 需要在其中查找颜色的字符串类 token，3.12 起 f-string 的文本部分单独成为 token
+_STRING_TOKENS = {token.STRING, getattr(token, "FSTRING_MIDDLE", token.STRING)}
+# 位于这些 token 之后的括号是函数调用或下标，不是元组
+_CALL_PREFIX = {")", "]"}
+# 元组匹配与颜色上下文需要的 token，NEWLINE 用于区分语句
+_KEPT_TOKENS = {token.OP, token.NUMBER, token.NAME, token.STRING, token.NEWLINE}
+# 数字元组只有出现在这类名称的赋值、关键字参数、字典键或函数调用中时
+# 才视为颜色，如 color = (1, 2, 3)、fill=(...)、{"bg": (...)}、set_color((...))，
+# 而 i = (1, 2, 3) 与下标 x[(1, 2, 3)] 不是
+_COLOR_NAME_RE = re.compile(
+    r"colou?r|rgba?|fill|stroke|outline|border|background|foreground|palette"
+    r"|tint|shade|theme|(?:^|_)[bf]g(?:_|\d|$)",
+    re.IGNORECASE,
+)
+
+
+def _alpha(text: str) -> float:
+    """
+    与 colorPicker.js 一致：大于 1 的透明度按 0 到 255 处理。
+    """
+    a = float(text)
+    return a / 255 if a > 1 else a
+
+
+def _rgb(values: list[str]):
+    r, g, b = (int(v) for v in values)
+    if r > 255 or g > 255 or b > 255:
+        return None
+    return r, g, b
+
+
+def _scan_string(text: str, start: int):
+    for m in _STRING_COLOR_RE.finditer(text):
+        if m["hex"]:
+            hex_ = m["hex"]
+            if len(hex_) == 3:
+                hex_ = "".join(c * 2 for c in hex_)
+            r, g, b = (int(hex_[i : i + 2], 16) for i in (0, 2, 4))
+            a = int(hex_[6:8], 16) / 255 if len(hex_) == 8 else 1
+            yield start + m.start(), start + m.end(), r, g, b, a, "hex"
+            continue
+        rgb = _rgb([m["r"], m["g"], m["b"]])
+        a = _alpha(m["a"]) if m["a"] is not None else 1
+        if rgb is None or a > 1:
+            continue
+        yield (start + m.start(), start + m.end(), *rgb, a, m["func"])
+
+
+def _match_tuple(tokens: list, i: int):
+    """
+    从 tokens[i]（左括号）开始匹配 (r, g, b) 或 (r, g, b, a)。
+
+    :return: (右括号下标, [r, g, b, a 文本])，不匹配时返回 None
+    """
+    values = []
+    j = i + 1
+    while j < len(tokens) and len(values) < 4:
+        tok = tokens[j]
+        if tok.type != token.NUMBER:
+            return None
+        values.append(tok.string)
+        nxt = tokens[j + 1] if j + 1 < len(tokens) else None
+        if nxt is None or nxt.type != token.OP:
+            return None
+        if nxt.string == ")":
+            if len(values) < 3:
+                return None
+            return j + 1, values
+        if nxt.string != ",":
+            return None
+        j += 2
+    return None
+
+
+def _is_call(prev) -> bool:
+    """
+    判断 prev 之后的括号是否为函数调用或下标。
+    """
+    return prev is not None and (
+        prev.type == token.NAME
+        and not keyword.iskeyword(prev.string)
+        or prev.type == token.OP
+        and prev.string in _CALL_PREFIX
+    )
+
+
+def _owner_name(tokens: list, i: int) -> str:
+    """
+    tokens[i]（左括号）所属的名称：name = (、name=(、"key": (、name: (
+    中的 name 或 key，以及函数调用 name( 中的函数名，没有时返回 None。
+    """
+    prev = tokens[i - 1] if i else None
+    if prev is None:
+        return None
+    if prev.type == token.NAME and not keyword.iskeyword(prev.string):
+        return prev.string
+    if prev.type == token.OP and prev.string in ("=", ":") and i >= 2:
+        owner = tokens[i - 2]
+        if prev.string == "=":
+            annotated = _annotated_name(tokens, i - 2)
+            if annotated is not None:
+                return annotated
+        if owner.type == token.NAME:
+            return owner.string
+        if owner.type == token.STRING:
+            return owner.string.strip("'\"")
+    return None
+
+
+def _annotated_name(tokens: list, j: int) -> str:
+    """
+    从 tokens[j] 向前越过类型注解，返回 name: T = ... 中的 name。
+    """
+    depth = 0
+    while j > 0:
+        tok = tokens[j]
+        if tok.type == token.NEWLINE:
+            break
+        if tok.type == token.OP:
+            if tok.string in ")]":
+                depth += 1
+            elif tok.string in "([{":
+                if not depth:
+                    break
+                depth -= 1
+            elif not depth and tok.string in (",", ";", "="):
+                break
+            elif not depth and tok.string == ":":
+                owner = tokens[j - 1]
+                return owner.string if owner.type == token.NAME else None
+        j -= 1
+    return None
+
+
+def _color_contexts(tokens: list) -> set:
+    """
+    一次遍历括号嵌套，找出处于颜色上下文中的左括号下标：括号自身属于
+    颜色名称，或位于这样的括号之内。下标中的括号不继承上下文。
+    """
+    result = set()
+    stack = []
+    for i, tok in enumerate(tokens):
+        if tok.type == token.NEWLINE:
+            stack.clear()
+            continue
+        if tok.type != token.OP:
+            continue
+        if tok.string in "([{":
+            if tok.string == "[" and _is_call(tokens[i - 1] if i else None):
+                color = False
+            else:
+                name = _owner_name(tokens, i)
+                color = bool(stack and stack[-1]) or bool(
+                    name and _COLOR_NAME_RE.search(name)
+                )
+            stack.append(color)
+            if color:
+                result.add(i)
+        elif tok.string in ")]}" and stack:
+            stack.pop()
+    return result
+
+
+def scan_colors(text: str, budget=None):
+    """
+    用 tokenize 在一次遍历中查找颜色字面量：字符串中的 rgb()、rgba()、#hex，
+    rgb(...) / rgba(...) 调用，以及颜色上下文中由数字组成的 (r, g, b) /
+    (r, g, b, a) 元组，见 _COLOR_NAME_RE。注释、其他函数调用参数、下标与
+    其他代码中的文本不会被匹配。
+
+    源码存在语法错误时，返回出错位置之前找到的颜色。
+
+    :param text: 源码文本
+    :param budget: 带有 exhausted() 方法的预算对象，耗尽时停止并返回 False
+    :return: ([(起始索引, 结束索引, r, g, b, a, 格式)], 是否完整扫描)，
+        索引为字符索引，a 为 0 到 1 之间的透明度，
+        格式为 "rgb"、"rgba"、"hex" 或 "tuple"
+    """
+    # StringIO.readline 只按 \n 分行，token 的行号与之对应
+    line_starts = [0]
+    line_starts.extend(m.end() for m in re.finditer("\n", text))
+
+    def index(pos: tuple[int, int]) -> int:
+        return line_starts[pos[0] - 1] + pos[1]
+
+    # 只保留有意义的 token，注释、缩进与括号内的换行不影响元组匹配
+    tokens = []
+    colors = []
+    readline = io.StringIO(text).readline
+    try:
+        for count, tok in enumerate(tokenize.generate_tokens(readline)):
+            if budget is not None and not count & 0xFF and budget.exhausted():
+                return colors, False
+            if tok.type in _STRING_TOKENS:
+                start, end = index(tok.start), index(tok.end)
+                colors.extend(_scan_string(text[start:end], start))
+            if tok.type in _KEPT_TOKENS:
+                tokens.append(tok)
+    except (tokenize.TokenError, SyntaxError):
+        pass
+
+    contexts = _color_contexts(tokens)
+    tuples = []
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok.type != token.OP or tok.string != "(":
+            i += 1
+            continue
+        prev = tokens[i - 1] if i else None
+        call = _is_call(prev)
+        name = prev.string if call and prev.type == token.NAME else None
+        if call and name not in ("rgb", "rgba") or not call and i not in contexts:
+            i += 1
+            continue
+        match = _match_tuple(tokens, i)
+        if match is None:
+            i += 1
+            continue
+        close, values = match
+        rgb = None
+        if all(_CHANNEL_RE.fullmatch(v) for v in values[:3]):
+            rgb = _rgb(values[:3])
+        a = 1
+        if len(values) == 4:
+            a = _alpha(values[3]) if _ALPHA_RE.fullmatch(values[3]) else None
+        if rgb is not None and a is not None and a <= 1:
+            first = prev if name else tok
+            fmt = name or "tuple"
+            tuples.append(
+                (index(first.start), index(tokens[close].end), *rgb, a, fmt)
+            )
+        i = close + 1
+
+    colors.extend(tuples)
+    colors.sort()
+    return colors, True
+
@@ -0,0 +1,384 @@
+import ast
+
+from array import array
+from bisect import bisect_left
+
+from ast_parse import Range, _astral_offsets, _index_of_astral
+from budget import Budget
+from rule_engine import RuleEngine
+
+
+def _utf16_len(text: str) -> int:
+    """
+    计算字符串在 UTF-16 中的长度。
+    """
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _shift(value, delta: int):
+    """
+    将结果中的所有偏移整体平移 delta，字典的键保持不变。
+    """
+    if not delta:
+        return value
+    if isinstance(value, int):
+        return value + delta
+    if isinstance(value, tuple):
+        return tuple(_shift(v, delta) for v in value)
+    if isinstance(value, list):
+        return [_shift(v, delta) for v in value]
+    if isinstance(value, dict):
+        return {k: _shift(v, delta) for k, v in value.items()}
+    return value
+
+
+class Segment:
+    """
+    文档中一组顶层语句对应的片段，缓存其在片段内的分析结果。
+    """
+
+    def __init__(self, start: int, start_utf16: int, text: str, myRange: Range):
+        """
+        :param start: 片段在文档中的字符索引
+        :param start_utf16: 片段在文档中的 UTF-16 偏移
+        :param text: 片段文本，从行首开始
+        :param myRange: 片段对应的 Range，偏移相对于片段开头
+        """
+        self.start = start
+        self.start_utf16 = start_utf16
+        self.text = text
+        self.range = myRange
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+
+class DocumentSession:
+    """
+    常驻进程中的文档会话：接受 VS Code 的增量修改，
+    只重新解析受影响的顶层语句，其余片段的结果平移后复用。
+    """
+
+    def __init__(self, text: str, version: int = None):
+        """
+        :param text: 文档全文
+        :param version: 文档版本号
+        """
+        self.version = version
+        self._text = text
+        self._segments = None
+        # 延迟到第一次需要结果时再解析，缓存命中时可以完全跳过解析
+        self._parsed = False
+        # 没有片段时使用的全文 BMP 之外字符索引表，第一次需要时构建，随修改更新
+        self._astral = None
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def _full_parse(self, budget: Budget = None) -> None:
+        """
+        完整解析文档；语法错误时不保留片段，结果与 Range(text) 一致为空。
+
+        解析或切分期间时间预算耗尽时不保留任何状态，文档仍处于未解析状态，
+        下一次请求重新解析。
+
+        :param budget: 时间预算
+        """
+        try:
+            tree = ast.parse(self._text)
+        except (SyntaxError, RecursionError):
+            self._segments = None
+            self._parsed = True
+            return
+        segments = self._split(self._text, tree, 0, 0, budget)
+        if segments is None:
+            return
+        self._segments = segments
+        self._parsed = True
+
+    def _split(
+        self,
+        text: str,
+        tree: ast.Module,
+        start: int,
+        start_utf16: int,
+        budget: Budget = None,
+    ):
+        """
+        按顶层语句把已解析的文本切分为片段，共享行的语句归入同一片段。
+
+        :param text: 被解析的文本，从行首开始
+        :param tree: text 的语法树
+        :param start: text 在文档中的字符索引
+        :param start_utf16: text 在文档中的 UTF-16 偏移
+        :param budget: 时间预算，耗尽时停止切分并返回 None，此时 tree 已被部分修改
+        :return: 片段列表
+        """
+        if budget is not None and budget.exhausted():
+            return None
+        groups = []
+        last_end_lineno = 0
+        for stmt in tree.body:
+            decorators = getattr(stmt, "decorator_list", ())
+            first = min([stmt.lineno] + [d.lineno for d in decorators])
+            if groups and first <= last_end_lineno:
+                groups[-1][1].append(stmt)
+            else:
+                groups.append((first, [stmt]))
+            last_end_lineno = max(last_end_lineno, stmt.end_lineno)
+
+        if not groups:
+            return [Segment(start, start_utf16, text, Range(text, ast.Module([], [])))]
+
+        index = Range(text, ast.Module([], []))
+        bounds = [0] + [index._line_starts[first - 1] for first, _ in groups[1:]]
+        bounds.append(len(text))
+
+        segments = []
+        for i, (first, stmts) in enumerate(groups):
+            if budget is not None and not i & 0x3F and budget.exhausted():
+                return None
+            seg_text = text[bounds[i] : bounds[i + 1]]
+            # 第一个片段从 text 开头开始，包含前导的注释与空行
+            seg_lineno = 1 if i == 0 else first
+            for stmt in stmts:
+                # 行号改为相对于片段开头
+                ast.increment_lineno(stmt, 1 - seg_lineno)
+            segments.append(
+                Segment(
+                    start,
+                    start_utf16,
+                    seg_text,
+                    Range(seg_text, ast.Module(stmts, [])),
+                )
+            )
+            start += len(seg_text)
+            start_utf16 += segments[-1].range.utf16_offset(len(seg_text))
+        return segments
+
+    def _reset(self) -> None:
+        """
+        丢弃片段，下一次 results 时在请求的时间预算内重新完整解析。
+        """
+        self._segments = None
+        self._parsed = False
+
+    def apply_changes(self, changes: list[dict], version: int = None) -> None:
+        """
+        应用 VS Code 风格的增量修改 {rangeOffset, rangeLength, text}。
+
+        :param changes: 按顺序应用的修改列表，偏移为 UTF-16
+        :param version: 修改后的文档版本号
+        """
+        for change in changes:
+            self._apply_change(change)
+        self.version = version
+
+    def _index_of_utf16(self, offset: int) -> int:
+        """
+        将 VS Code 的 UTF-16 偏移转换为字符索引。有片段时使用所在片段 Range
+        已有的索引表，否则使用全文的索引表，都只需一次二分查找。
+
+        :param offset: UTF-16 偏移
+        :return: 字符索引
+        """
+        text = self._text
+        if text.isascii():
+            return offset
+        segments = self._segments
+        if segments is None:
+            if self._astral is None:
+                self._astral = _astral_offsets(text)
+            return _index_of_astral(self._astral, offset)
+        # 片段首尾相接覆盖全文，二分查找 start_utf16 不超过 offset 的最后一个片段
+        lo, hi = 0, len(segments)
+        while lo + 1 < hi:
+            mid = (lo + hi) // 2
+            if segments[mid].start_utf16 <= offset:
+                lo = mid
+            else:
+                hi = mid
+        seg = segments[lo]
+        return seg.start + seg.range.index_of_utf16(offset - seg.start_utf16)
+
+    def _update_astral(self, start: int, end: int, new_text: str) -> None:
+        """
+        用 new_text 替换 [start, end) 后更新全文的索引表：修改之前的部分不变，
+        之后的部分整体平移，只扫描新插入的文本。
+        """
+        astral = self._astral
+        delta = len(new_text) - (end - start)
+        tail = astral[bisect_left(astral, end) :]
+        if delta and tail:
+            tail = array("q", map(delta.__add__, tail))
+        inserted = _astral_offsets(new_text)
+        if inserted:
+            inserted = array("q", map(start.__add__, inserted))
+        self._astral = astral[: bisect_left(astral, start)] + inserted + tail
+
+    def _apply_change(self, change: dict) -> None:
+        text = self._text
+        start = self._index_of_utf16(change["rangeOffset"])
+        end = self._index_of_utf16(change["rangeOffset"] + change["rangeLength"])
+        new_text = change["text"]
+        self._text = text[:start] + new_text + text[end:]
+        if self._astral is not None:
+            self._update_astral(start, end, new_text)
+
+        if not self._parsed:
+            return
+        if self._segments is None:
+            # 完整解析推迟到下一次 results，在请求的时间预算内进行
+            self._parsed = False
+            return
+
+        # 找出与修改区间相交（含边界）的片段
+        segments = self._segments
+        first = next(i for i, seg in enumerate(segments) if seg.end >= start)
+        last = first
+        while last + 1 < len(segments) and segments[last + 1].start <= end:
+            last += 1
+
+        region_start = segments[first].start
+        region_start_utf16 = segments[first].start_utf16
+        region_text = self._text[
+            region_start : segments[last].end + len(new_text) - (end - start)
+        ]
+        try:
+            tree = ast.parse(region_text)
+        except (SyntaxError, RecursionError):
+            self._reset()
+            return
+        if region_start and any(
+            isinstance(stmt, ast.ImportFrom) and stmt.module == "__future__"
+            for stmt in tree.body
+        ):
+            # __future__ 导入只能出现在文件开头，交给完整解析判断
+            self._reset()
+            return
+
+        replaced = self._split(region_text, tree, region_start, region_start_utf16)
+        delta = len(self._text) - len(text)
+        delta_utf16 = _utf16_len(new_text) - _utf16_len(text[start:end])
+        for seg in segments[last + 1 :]:
+            seg.start += delta
+            seg.start_utf16 += delta_utf16
+        self._segments = segments[:first] + replaced + segments[last + 1 :]
+
+    def results(
+        self, modes: list[str], settings: dict = None, budget: Budget = None
+    ) -> dict:
+        """
+        计算各模式的结果，与对全文执行 Range(text) 的结果一致。
+
+        :param modes: 分析模式列表
+        :param settings: pycodejojo.* 开关
+        :param budget: 时间预算，耗尽时返回部分结果
+        :return: 以模式名为键的结果字典
+        """
+        engine = RuleEngine(settings)
+        modes = [mode for mode in modes if engine.is_enabled(mode)]
+        mergeable = [mode for mode in modes if mode in _MERGERS]
+        if not mergeable and self._segments is None:
+            # 没有可以合并的模式时，切分片段只是额外开销
+            return engine.run(Range(self._text), modes, budget=budget)
+        if not self._parsed:
+            self._full_parse(budget)
+            if not self._parsed:
+                # 预算在解析期间耗尽：不使用语法树，基于语法树的规则立即以
+                # 截断的空结果返回，基于 token 的规则在剩余预算内扫描
+                empty = ast.Module(body=[], type_ignores=[])
+                return engine.run(Range(self._text, empty), modes, budget=budget)
+        if self._segments is None:
+            # 语法错误时基于语法树的规则没有结果，基于 token 的规则仍然扫描全文
+            empty = ast.Module(body=[], type_ignores=[])
+            return engine.run(Range(self._text, empty), modes, budget=budget)
+
+        for seg in self._segments:
+            engine.run(seg.range, mergeable, budget=budget)
+        result = {mode: _MERGERS[mode](self._segments) for mode in mergeable}
+        rest = [mode for mode in modes if mode not in _MERGERS]
+        if rest:
+            # 没有合并方式的规则退回到一次完整分析
+            result.update(engine.run(Range(self._text), rest, budget=budget))
+        return {mode: result[mode] for mode in modes}
+
+
+def _merge_super_init(segments: list[Segment]) -> list:
+    result = []
+    for seg in segments:
+        result.extend(_shift(seg.range._super_init_ranges, seg.start_utf16))
+    return result
+
+
+def _merge_loop_conflicts(segments: list[Segment]) -> list:
+    result = []
+    for seg in segments:
+        result.extend(_shift(seg.range._loop_conflict_ranges, seg.start_utf16))
+    return result
+
+
+def _merge_map(attr: str):
+    def merge(segments: list[Segment]) -> dict:
+        result = {}
+        for seg in segments:
+            result.update(_shift(getattr(seg.range, attr), seg.start_utf16))
+        return result
+
+    return merge
+
+
+def _merge_name_conflicts(segments: list[Segment]) -> list:
+    classes = _merge_map("_classes_range_map")(segments)
+    imports = _merge_map("_imports_range_map")(segments)
+    return [
+        {"class": classes[name], "import": imports[name]}
+        for name in imports
+        if name in classes
+    ]
+
+
+def _merge_attrs(segments: list[Segment]) -> list:
+    """
+    同一属性路径在多个片段中出现时合并出现位置，line / col / parent_class
+    取第一次出现的位置，行号加上片段之前的行数。
+    """
+    result = {}
+    line_offset = 0
+    for seg in segments:
+        for info in seg.range._attr_index.values():
+            occurrences = _shift(info["occurrences"], seg.start_utf16)
+            merged = result.get(info["path"])
+            if merged is None:
+                merged = dict(info, line=info["line"] + line_offset, occurrences=[])
+                result[info["path"]] = merged
+            merged["occurrences"].extend(occurrences)
+        # 片段从行首开始，行首表的长度减一即片段内的换行数
+        line_offset += len(seg.range._line_starts) - 1
+    return list(result.values())
+
+
+def _merge_colors(segments: list[Segment]) -> list:
+    result = []
+    for seg in segments:
+        delta = seg.start_utf16
+        result.extend(
+            [start + delta, end + delta, *rest]
+            for start, end, *rest in seg.range._color_literals
+        )
+    return result
+
+
+# 各模式的片段结果合并方式
+_MERGERS = {
+    "get_classes_without_parent_init_call": _merge_super_init,
+    "get_modules_with_name_conflicts": _merge_name_conflicts,
+    "get_for_loop_variable_conflicts": _merge_loop_conflicts,
+    "get_import_names_range": _merge_map("_imports_range_map"),
+    "get_all_attr": _merge_attrs,
+    "color_scan": _merge_colors,
+}
@@ -1,40 +1,289 @@
+import time
+
+# 记录模块导入开始的时间，用于统计启动阶段耗时
+_START = time.perf_counter()
+
 import sys
 import json
 import argparse
 
-from ast_parse import Range
-from color_picker import ColorPicker
+from metrics import PROFILE_ENV, Metrics, dump_profile, profiling_requested
+
+# 除 metrics 外，各模式依赖的模块都在第一次使用时才导入：
+# 诊断路径不会加载 tkinter、concurrent.futures、hashlib 等模块。
+
+
+def _open_cache(args):
+    if not args.cache_dir:
+        return None
+    from result_cache import ResultCache
+
+    return ResultCache(directory=args.cache_dir)
+
+
+def _analysis_request(args, myTools, metrics: Metrics):
+    """
+    读取标准输入并解析 --mode / --modes / --settings。
+
+    :return: (源码, 模式列表, 设置, 结果是否以模式名为键)，
+        不是分析模式时模式列表为 None
+    """
+    from analysis import ANALYSIS_MODES, resolve_modes
+
+    # 从标准输入读取代码内容
+    with metrics.phase("read"):
+        raw = sys.stdin.buffer.read()
+        data = raw.decode("utf-8")
+    metrics.count("stdin_bytes", len(raw))
+
+    settings = json.loads(args.settings) if args.settings else None
+
+    # 根据命令行参数执行不同的分析
+    if args.modes is not None or args.mode == "all":
+        modes = resolve_modes(args.modes if args.modes is not None else args.mode)
+        unknown = [mode for mode in modes if mode not in ANALYSIS_MODES]
+        if unknown:
+            myTools.error(f"unknown modes: {', '.join(unknown)}")
+        return data, modes, settings, True
+    if args.mode in ANALYSIS_MODES:
+        return data, [args.mode], settings, False
+    return data, None, settings, False
+
+
+def _run_analysis(args, myTools, metrics: Metrics):
+    """
+    基于 Range 的分析模式，支持单个 --mode、--mode all 以及 --modes。
+    """
+    from analysis import analyze
+
+    data, modes, settings, keyed = _analysis_request(args, myTools, metrics)
+    if modes is None:
+        return [None]
+    result = analyze(data, modes, settings, cache=_open_cache(args), metrics=metrics)
+    return result if keyed else result.get(args.mode, [])
+
+
+def _stream_analysis(args, myTools, metrics: Metrics) -> int:
+    """
+    --format compact / compact-binary：每个规则完成后立即写出一帧列式结果。
+
+    :return: 写出的字节数
+    """
+    from analysis import iter_analyze
+    from wire_format import write_frames
+
+    data, modes, settings, _ = _analysis_request(args, myTools, metrics)
+    results = iter_analyze(
+        data, modes or [], settings, cache=_open_cache(args), metrics=metrics
+    )
+    return write_frames(
+        sys.stdout.buffer, results, binary=args.format == "compact-binary"
+    )
+
+
+def _run_cross_file_conflicts(args, myTools, metrics: Metrics):
+    """
+    基于工作区符号索引的跨文件名称冲突检查，需要 --symbol-index 与 --file。
+    """
+    if not args.symbol_index or not args.file:
+        myTools.error("cross_file_conflicts requires --symbol-index and --file")
+    from symbol_index import SymbolIndex
+
+    with metrics.phase("read"):
+        data = sys.stdin.buffer.read().decode("utf-8")
+    index = SymbolIndex(args.symbol_index)
+    try:
+        with metrics.phase("query"):
+            return index.conflicts(args.file, data)
+    finally:
+        index.close()
+
+
+def _run_property_stubs(args, myTools, metrics: Metrics):
+    """
+    为 --offset 所在类中的私有属性生成 property 与 setter。
+    """
+    if args.offset is None:
+        myTools.error("property_stubs requires --offset")
+    from property_stubs import property_stubs
+
+    with metrics.phase("read"):
+        data = sys.stdin.buffer.read().decode("utf-8")
+    return property_stubs(data, args.offset, args.selection_end)
+
+
+def _run_color_picker(args, myTools, metrics: Metrics):
+    from color_picker import ColorPicker
+
+    picker = ColorPicker(init_color=args.input_color)
+    return picker.get_result()
+
+
+# 模式注册表：模式名 -> 执行函数，未注册的模式交给 _run_analysis
+MODE_RUNNERS = {
+    "color_picker": _run_color_picker,
+    "cross_file_conflicts": _run_cross_file_conflicts,
+    "property_stubs": _run_property_stubs,
+}
 
 
 def main():
+    startup = time.perf_counter() - _START
+
     # 设置命令行参数解析
     myTools = argparse.ArgumentParser(description="python代码分析工具")
     myTools.add_argument("--mode", type=str, default="default", help="模式")
     myTools.add_argument("--input_color", type=str, default="default", help="输入颜色")
+    myTools.add_argument(
+        "--modes", type=str, default=None, help="逗号分隔的多个分析模式，一次解析全部执行"
+    )
+    myTools.add_argument(
+        "--settings",
+        type=str,
+        default=None,
+        help='pycodejojo.* 设置的 JSON，如 {"superInitExemptBases": ["object"]}',
+    )
+    myTools.add_argument(
+        "--serve", action="store_true", help="常驻服务模式，从标准输入逐行读取 JSON 请求"
+    )
+    myTools.add_argument(
+        "--resident",
+        action="store_true",
+        help="配合 --mode color_picker 常驻取色窗口，逐行读取取色请求",
+    )
+    myTools.add_argument(
+        "--stream", action="store_true", help="列表结果逐项输出为一行 JSON"
+    )
+    myTools.add_argument(
+        "--format",
+        type=str,
+        choices=["json", "compact", "compact-binary"],
+        default="json",
+        help="分析结果的输出格式，compact 为逐规则输出的长度前缀列式帧",
+    )
+    myTools.add_argument(
+        "--paths", type=str, nargs="+", default=None, help="分析目录或文件，逐行输出 JSON"
+    )
+    myTools.add_argument(
+        "--include", type=str, action="append", default=None, help="--paths 的文件通配符"
+    )
+    myTools.add_argument(
+        "--exclude", type=str, action="append", default=None, help="--paths 跳过的通配符"
+    )
+    myTools.add_argument("--jobs", type=int, default=None, help="--paths 的进程数")
+    myTools.add_argument(
+        "--symbol-index", type=str, default=None, help="工作区符号索引的 SQLite 文件"
+    )
+    myTools.add_argument(
+        "--index-update",
+        action="store_true",
+        help="与 --paths、--symbol-index 一起使用：增量更新符号索引而不是分析文件",
+    )
+    myTools.add_argument(
+        "--file", type=str, default=None, help="标准输入中源码对应的文件路径"
+    )
+    myTools.add_argument(
+        "--offset", type=int, default=None, help="选区起始的 UTF-16 偏移"
+    )
+    myTools.add_argument(
+        "--selection-end", type=int, default=None, help="选区结束的 UTF-16 偏移"
+    )
+    myTools.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"输出各阶段耗时到标准错误，也可设置环境变量 {PROFILE_ENV}",
+    )
+    myTools.add_argument("--cprofile", type=str, default=None, help="cProfile 输出文件")
+    myTools.add_argument(
+        "--tracemalloc", type=str, default=None, help="tracemalloc 快照输出文件"
+    )
+    myTools.add_argument(
+        "--time-budget", type=float, default=None, help="--serve 中每个请求的时间预算（秒）"
+    )
+    myTools.add_argument(
+        "--max-size", type=int, default=None, help="--serve 中每个请求的源码字符数上限"
+    )
+    myTools.add_argument(
+        "--workers", type=int, default=None, help="--serve 中并发处理文档的线程数"
+    )
+    myTools.add_argument(
+        "--cache-dir", type=str, default=None, help="磁盘结果缓存目录，如扩展的 storage 目录"
+    )
 
     # 添加更多参数...
     args = myTools.parse_args()
 
-    # 从标准输入读取代码内容
-    data = sys.stdin.buffer.read().decode("utf-8")
+    if args.serve:
+        from server import serve
 
-    myRange = Range(data)
+        serve(
+            cache=_open_cache(args),
+            time_budget=args.time_budget,
+            max_size=args.max_size,
+            workers=args.workers,
+        )
+        return
 
-    # 根据命令行参数执行不同的分析
-    if args.mode == "get_classes_without_parent_init_call":
-        result = myRange.get_classes_without_parent_init_call()
-    elif args.mode == "get_modules_with_name_conflicts":
-        result = myRange.get_modules_with_name_conflicts()
-    elif args.mode == "get_import_names_range":
-        result = myRange.get_import_names_range()
-    elif args.mode == "color_picker":
-        picker = ColorPicker(init_color=args.input_color)
-        result = picker.get_result()
-    else:
-        result = [None]
+    if args.resident and args.mode == "color_picker":
+        from color_picker import serve_picks
+
+        serve_picks()
+        return
+
+    if args.paths and args.index_update:
+        if not args.symbol_index:
+            myTools.error("--index-update requires --symbol-index")
+        from symbol_index import SymbolIndex
+
+        index = SymbolIndex(args.symbol_index)
+        try:
+            summary = index.update(args.paths, args.include, args.exclude, args.jobs)
+        finally:
+            index.close()
+        sys.stdout.write(json.dumps(summary) + "\n")
+        return
+
+    if args.paths:
+        from analysis import ANALYSIS_MODES, resolve_modes
+        from rule_engine import RuleEngine
+        from workspace_scan import scan
+
+        modes = resolve_modes(args.modes) if args.modes else RuleEngine().diagnostics
+        unknown = [mode for mode in modes if mode not in ANALYSIS_MODES]
+        if unknown:
+            myTools.error(f"unknown modes: {', '.join(unknown)}")
+        sys.exit(scan(args.paths, modes, args.include, args.exclude, args.jobs))
+
+    metrics = Metrics(enabled=args.profile or profiling_requested())
+    metrics.add_time(metrics.phases, "startup", startup)
+
+    if args.format != "json":
+        if args.mode in MODE_RUNNERS:
+            myTools.error(f"--format {args.format} only applies to analysis modes")
+        with dump_profile(args.cprofile, args.tracemalloc):
+            with metrics.phase("frames"):
+                size = _stream_analysis(args, myTools, metrics)
+        metrics.count("output_bytes", size)
+        if metrics.enabled:
+            sys.stderr.write(json.dumps({"_metrics": metrics.as_dict()}) + "\n")
+        return
+
+    with dump_profile(args.cprofile, args.tracemalloc):
+        runner = MODE_RUNNERS.get(args.mode, _run_analysis)
+        result = runner(args, myTools, metrics)
+
+        with metrics.phase("json"):
+            if args.stream and isinstance(result, list):
+                output = "".join(json.dumps(item) + "\n" for item in result)
+            else:
+                output = json.dumps(result) + "\n"
+        metrics.count("output_chars", len(output))
 
     # 输出结果
-    print(json.dumps(result))
+    sys.stdout.write(output)
+    if metrics.enabled:
+        # 指标单独写入标准错误，不与结果混在一起
+        sys.stderr.write(json.dumps({"_metrics": metrics.as_dict()}) + "\n")
 
 
 if __name__ == "__main__":
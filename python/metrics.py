@@ -0,0 +1,106 @@
+import os
+import time
+from contextlib import contextmanager
+
+
+# 设置该环境变量（非空且不为 0）即可开启计时，等同于 --profile
+PROFILE_ENV = "PYCODEJOJO_PROFILE"
+
+
+def profiling_requested() -> bool:
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0")
+
+
+class Metrics:
+    """
+    按阶段、按规则记录耗时与计数。未启用时所有方法都是空操作。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.phases = {}
+        self.counts = {}
+        self.rules = {}
+        self.handlers = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        记录一个阶段的耗时，同名阶段累加。
+
+        :param name: 阶段名称
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(self.phases, name, time.perf_counter() - start)
+
+    def add_time(self, table: dict, name: str, seconds: float) -> None:
+        if self.enabled:
+            table[name] = table.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int) -> None:
+        """
+        记录计数，如字节数、节点数，同名计数累加。
+        """
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def as_dict(self) -> dict:
+        """
+        :return: 可 JSON 序列化的指标，耗时单位为毫秒
+        """
+
+        def ms(table: dict) -> dict:
+            return {name: round(seconds * 1000, 3) for name, seconds in table.items()}
+
+        return {
+            "phases": ms(self.phases),
+            "rules": {
+                name: ms(timings) for name, timings in self.rules.items()
+            },
+            "handlers": ms(self.handlers),
+            "counts": dict(self.counts),
+        }
+
+
+@contextmanager
+def dump_profile(cprofile_path: str = None, tracemalloc_path: str = None):
+    """
+    对单次请求执行 cProfile 与 tracemalloc，并把结果写入文件。
+
+    cProfile 结果可用 pstats 读取，tracemalloc 快照可用
+    tracemalloc.Snapshot.load 读取。
+
+    :param cprofile_path: cProfile 输出文件
+    :param tracemalloc_path: tracemalloc 快照输出文件
+    """
+    if not cprofile_path and not tracemalloc_path:
+        yield
+        return
+
+    # 只有真正导出剖析数据时才导入
+    import cProfile
+    import tracemalloc
+
+    profiler = cProfile.Profile() if cprofile_path else None
+    started_tracemalloc = False
+    if tracemalloc_path and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracemalloc = True
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        if tracemalloc_path:
+            tracemalloc.take_snapshot().dump(tracemalloc_path)
+            if started_tracemalloc:
+                tracemalloc.stop()
@@ -0,0 +1,166 @@
+import ast
+
+from ast_parse import Range
+
+
+def _enclosing_class(myRange: Range, index: int) -> ast.ClassDef:
+    """
+    从模块开始逐层进入包含 index 的语句，返回最内层的类定义。
+
+    :param myRange: 已解析的 Range 对象
+    :param index: 字符索引
+    :return: 类定义节点，不在任何类中时返回 None
+    """
+    found = None
+    node = myRange._tree
+    while node is not None:
+        parent, node = node, None
+        for child in ast.iter_child_nodes(parent):
+            if not isinstance(child, ast.stmt):
+                continue
+            # 装饰器属于类定义，从第一个装饰器开始算
+            decorators = getattr(child, "decorator_list", None)
+            first = decorators[0] if decorators else child
+            start = myRange.index_of_text(first.lineno, first.col_offset)
+            end = myRange.index_of_text(child.end_lineno, child.end_col_offset)
+            if start <= index <= end:
+                if isinstance(child, ast.ClassDef):
+                    found = child
+                node = child
+                break
+    return found
+
+
+def _private_targets(myRange: Range, cls: ast.ClassDef, start: int, end: int):
+    """
+    一次遍历类中各方法的语句，按首次出现的顺序收集 self._name 赋值目标，
+    不进入嵌套的类与函数。
+
+    :param start: 选区起始字符索引
+    :param end: 选区结束字符索引，与 start 相同时不按选区过滤
+    :return: 去掉前导下划线的属性名列表
+    """
+    names = {}
+    for func in cls.body:
+        if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        args = func.args.posonlyargs + func.args.args
+        if not args:
+            continue
+        self_name = args[0].arg
+        stack = list(reversed(func.body))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            if isinstance(node, ast.Assign):
+                targets = node.targets
+            elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+                targets = [node.target]
+            else:
+                targets = []
+            # 解包赋值 self._a, self._b = ... 中的每个目标
+            targets = list(targets)
+            while targets:
+                target = targets.pop(0)
+                if isinstance(target, (ast.Tuple, ast.List)):
+                    targets[:0] = target.elts
+                elif isinstance(target, ast.Starred):
+                    targets.insert(0, target.value)
+                elif (
+                    isinstance(target, ast.Attribute)
+                    and isinstance(target.value, ast.Name)
+                    and target.value.id == self_name
+                    and target.attr.startswith("_")
+                    and not target.attr.startswith("__")
+                ):
+                    index = myRange.index_of_text(target.lineno, target.col_offset)
+                    if start == end or start <= index < end:
+                        names.setdefault(target.attr[1:], None)
+            stack.extend(reversed(list(ast.iter_child_nodes(node))))
+    return list(names)
+
+
+def _existing_accessors(cls: ast.ClassDef) -> tuple[set, set]:
+    """
+    :return: (已有 @property 的名称, 已有 @x.setter 的名称)
+    """
+    getters, setters = set(), set()
+    for func in cls.body:
+        if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for decorator in func.decorator_list:
+            if isinstance(decorator, ast.Name) and decorator.id == "property":
+                getters.add(func.name)
+            elif (
+                isinstance(decorator, ast.Attribute)
+                and decorator.attr == "setter"
+                and isinstance(decorator.value, ast.Name)
+            ):
+                setters.add(decorator.value.id)
+    return getters, setters
+
+
+def property_stubs(text: str, offset: int, selection_end: int = None) -> dict:
+    """
+    为选区所在类中的私有属性生成缺少的 property 与 setter。
+
+    :param text: 源码文本
+    :param offset: 选区起始的 UTF-16 偏移
+    :param selection_end: 选区结束的 UTF-16 偏移，提供且不同于 offset 时
+        只处理选区中的赋值，否则处理整个类
+    :return: {class, attributes, stubs, offset}，class 为类名的 UTF-16 偏移区间，
+        attributes 为找到的私有属性名，stubs 为需要插入的代码，offset 为插入位置；
+        不在类中或源码无法解析时返回 None
+    """
+    myRange = Range(text)
+    if myRange._tree is None:
+        return None
+    start = myRange.index_of_utf16(offset)
+    end = start if selection_end is None else myRange.index_of_utf16(selection_end)
+    cls = _enclosing_class(myRange, start)
+    if cls is None:
+        return None
+
+    names = _private_targets(myRange, cls, start, end)
+    getters, setters = _existing_accessors(cls)
+
+    # 使用类体已有的缩进，嵌套一层的缩进取类体相对类定义的缩进
+    first = cls.body[0]
+    body_start = myRange.index_of_text(first.lineno, first.col_offset)
+    line_start = myRange._line_starts[first.lineno - 1]
+    indent = text[line_start:body_start]
+    if not indent or indent.strip():
+        # 类体与类定义写在同一行
+        indent = " " * (cls.col_offset + 4)
+    step = indent[cls.col_offset :] or "    "
+
+    stubs = []
+    for name in names:
+        if name not in getters:
+            stubs.append(
+                f"{indent}@property\n"
+                f"{indent}def {name}(self):\n"
+                f"{indent}{step}return self._{name}\n"
+            )
+        if name not in setters:
+            stubs.append(
+                f"{indent}@{name}.setter\n"
+                f"{indent}def {name}(self, value):\n"
+                f"{indent}{step}self._{name} = value\n"
+            )
+
+    # 插入到类的最后一行之后
+    if cls.end_lineno < len(myRange._line_starts):
+        insert = myRange._line_starts[cls.end_lineno]
+        prefix = ""
+    else:
+        insert = len(text)
+        prefix = "" if text.endswith(("\n", "\r")) else "\n"
+    code = (prefix + "".join("\n" + stub for stub in stubs)) if stubs else ""
+    return {
+        "class": myRange._span(*myRange._name_span(cls)),
+        "attributes": names,
+        "stubs": code,
+        "offset": myRange.utf16_offset(insert),
+    }
@@ -0,0 +1,148 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from rule_engine import ANALYZER_VERSION
+
+
+class ResultCache:
+    """
+    分析结果缓存，以 (源码哈希, 模式, 分析器版本) 为键，按 LRU 淘汰。
+
+    内存中同时受条目数和字节数限制；可选的磁盘目录（如扩展的 storage 目录）
+    用于跨进程、跨重启复用结果。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 32 * 1024 * 1024,
+        directory: str = None,
+    ):
+        """
+        :param max_entries: 内存中最多保留的条目数
+        :param max_bytes: 内存中结果（JSON 文本）的总字节数上限
+        :param directory: 磁盘缓存目录，None 表示只使用内存
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # 常驻服务的多个工作线程共享同一个缓存
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(text: str) -> str:
+        """
+        计算源码文本的哈希。
+
+        :param text: 源码文本
+        :return: 十六进制摘要
+        """
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _key(self, digest: str, mode: str) -> tuple[str, str, str]:
+        return digest, mode, ANALYZER_VERSION
+
+    def _path(self, digest: str, mode: str) -> str:
+        return os.path.join(
+            self.directory, ANALYZER_VERSION, digest[:2], f"{digest}-{mode}.json"
+        )
+
+    def get(self, digest: str, mode: str):
+        """
+        读取缓存结果。
+
+        :param digest: 源码哈希
+        :param mode: 分析模式，或 RuleEngine.cache_key 得到的缓存键
+        :return: 缓存的结果，未命中时返回 None
+        """
+        key = self._key(digest, mode)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if data is not None:
+            return json.loads(data)
+
+        if self.directory:
+            try:
+                with open(self._path(digest, mode), "r", encoding="utf-8") as f:
+                    data = f.read()
+            except OSError:
+                pass
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, data)
+                return json.loads(data)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, digest: str, mode: str, value) -> None:
+        """
+        写入缓存结果。
+
+        :param digest: 源码哈希
+        :param mode: 分析模式，或 RuleEngine.cache_key 得到的缓存键
+        :param value: 可 JSON 序列化的结果
+        """
+        data = json.dumps(value)
+        with self._lock:
+            self._store(self._key(digest, mode), data)
+
+        if self.directory:
+            path = self._path(digest, mode)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError:
+                # 磁盘缓存只是加速手段，写入失败不影响结果
+                pass
+
+    def _store(self, key: tuple, data: str) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = data
+        self._bytes += len(data)
+
+        # 超出条目数或字节数上限时淘汰最久未使用的条目
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        :return: 命中、未命中、淘汰计数及当前占用
+        """
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
@@ -0,0 +1,209 @@
+import time
+
+from ast_parse import Range
+from budget import Budget
+from metrics import Metrics
+
+
+# 分析器版本，规则的实现或输出格式变化时需要递增，使旧的缓存结果失效
+ANALYZER_VERSION = "2"
+
+
+class Rule:
+    """
+    诊断规则：声明所需的节点处理函数及结果获取方式，由 RuleEngine 统一调度。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handlers: list,
+        result,
+        setting: str = None,
+        options: list[str] = None,
+    ):
+        """
+        :param name: 规则名称，同时也是 main.py 中的模式名
+        :param handlers: 由 handles 标记过的 Range 节点处理函数
+        :param result: 遍历结束后从 Range 中取出结果的函数
+        :param setting: 对应的 pycodejojo.* 开关，None 表示始终启用
+        :param options: 影响结果的 pycodejojo.* 选项，值为名称列表
+        """
+        self.name = name
+        self.handlers = handlers
+        self.result = result
+        self.setting = setting
+        self.options = options or []
+
+
+# 内置规则，多个规则共用的处理函数在一次遍历中只执行一次
+RULES = [
+    Rule(
+        "get_classes_without_parent_init_call",
+        [Range._check_super_init],
+        Range.get_classes_without_parent_init_call,
+        setting="checkMissingSuperInit",
+        options=["superInitExemptBases"],
+    ),
+    Rule(
+        "get_modules_with_name_conflicts",
+        [Range._scan_class_name, Range._scan_import_names],
+        Range.get_modules_with_name_conflicts,
+        setting="checkImportVsLocalClassConflict",
+    ),
+    Rule(
+        "get_for_loop_variable_conflicts",
+        [Range._check_loop_variable],
+        Range.get_for_loop_variable_conflicts,
+        setting="checkForLoopVariableConflict",
+    ),
+    Rule(
+        "get_import_names_range",
+        [Range._scan_import_names],
+        Range.get_import_names_range,
+    ),
+    Rule("get_all_attr", [Range._scan_attr], Range.get_all_attr),
+    # 颜色字面量基于 token 扫描，不需要遍历语法树
+    Rule("color_scan", [], Range.get_color_literals),
+]
+
+
+class RuleEngine:
+    """
+    规则引擎：把所有启用规则的节点处理函数合并到同一次 AST 遍历中执行。
+    """
+
+    def __init__(self, settings: dict = None):
+        """
+        :param settings: pycodejojo.* 开关，如 {"checkMissingSuperInit": False}
+        """
+        self._settings = settings or {}
+        self._rules = {}
+        for rule in RULES:
+            self.register(rule)
+
+    def register(self, rule: Rule) -> None:
+        """
+        注册规则，同名规则会被覆盖。
+
+        :param rule: 规则
+        """
+        self._rules[rule.name] = rule
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._rules)
+
+    @property
+    def diagnostics(self) -> list[str]:
+        """
+        与 pycodejojo.* 诊断开关对应、结果会显示为诊断信息的规则。
+        """
+        return [name for name, rule in self._rules.items() if rule.setting]
+
+    def is_enabled(self, name: str) -> bool:
+        """
+        判断规则是否启用。
+
+        :param name: 规则名称
+        """
+        setting = self._rules[name].setting
+        return setting is None or bool(self._settings.get(setting, True))
+
+    def options(self, name: str) -> dict:
+        """
+        获取规则在当前设置下的选项，未设置的选项使用规则的默认值。
+
+        :param name: 规则名称
+        """
+        return {
+            key: self._settings[key]
+            for key in self._rules[name].options
+            if self._settings.get(key) is not None
+        }
+
+    def cache_key(self, name: str) -> str:
+        """
+        规则结果的缓存键：没有设置选项时就是规则名称，否则附加选项的值，
+        使不同选项下的结果分开缓存。
+
+        :param name: 规则名称
+        """
+        options = self.options(name)
+        return "+".join(
+            [name] + [f"{k}={','.join(sorted(v))}" for k, v in sorted(options.items())]
+        )
+
+    def run(
+        self,
+        myRange: Range,
+        names: list[str] = None,
+        metrics: Metrics = None,
+        budget: Budget = None,
+    ) -> dict:
+        """
+        在一次遍历中执行指定的规则，未启用的规则不会出现在结果中。
+
+        :param myRange: 已解析的 Range 对象
+        :param names: 规则名称列表，默认执行全部规则
+        :param metrics: 提供且启用时记录遍历耗时及每个规则的耗时
+        :param budget: 时间预算与取消状态，耗尽时返回部分结果并设置 truncated
+        :return: 以规则名为键的结果字典
+        """
+        result = dict(self.iter_run(myRange, names, metrics, budget))
+        # 按请求的顺序返回
+        return {
+            name: result[name]
+            for name in (names if names is not None else self._rules)
+            if name in result
+        }
+
+    def iter_run(
+        self,
+        myRange: Range,
+        names: list[str] = None,
+        metrics: Metrics = None,
+        budget: Budget = None,
+    ):
+        """
+        与 run 相同，但每个规则得到结果后立即产生 (规则名, 结果)：
+        不需要遍历语法树的规则先于遍历产生，其余规则在共享的遍历结束后依次产生。
+        """
+        rules = [
+            self._rules[name]
+            for name in (names if names is not None else self._rules)
+            if self.is_enabled(name)
+        ]
+        options = {}
+        for rule in rules:
+            options.update(self.options(rule.name))
+        myRange._begin(budget, options)
+        rules = [rule for rule in rules if not rule.handlers] + [
+            rule for rule in rules if rule.handlers
+        ]
+        handlers = [handler for rule in rules for handler in rule.handlers]
+        enabled = metrics is not None and metrics.enabled
+        timings = {} if enabled else None
+        for rule in rules:
+            if rule.handlers and handlers:
+                if not enabled:
+                    myRange._dispatch(handlers)
+                else:
+                    with metrics.phase("walk"):
+                        myRange._dispatch(handlers, timings)
+                    for name, seconds in timings.items():
+                        metrics.add_time(metrics.handlers, name, seconds)
+                handlers = None
+            if not enabled:
+                yield rule.name, rule.result(myRange)
+                continue
+            start = time.perf_counter()
+            value = rule.result(myRange)
+            rule_timings = metrics.rules.setdefault(rule.name, {})
+            # 多个规则共用的处理函数，其耗时会计入每个使用它的规则
+            for handler in rule.handlers:
+                metrics.add_time(
+                    rule_timings, "handlers", timings.get(handler.__name__, 0.0)
+                )
+            metrics.add_time(rule_timings, "result", time.perf_counter() - start)
+            yield rule.name, value
@@ -0,0 +1,313 @@
+import os
+import time
+import heapq
+import threading
+from collections import deque
+
+from budget import Budget
+
+
+# 优先级类别，数值越小越先执行：
+# active 为正在编辑的文档，visible 为其他可见或已打开的标签页，
+# background 为打开文件夹等批量触发的文档
+PRIORITIES = {"active": 0, "visible": 1, "background": 2}
+DEFAULT_PRIORITY = "visible"
+
+# 低优先级任务暂停时，每隔这么久（秒）检查一次是否已被取消
+_PAUSE_POLL = 0.05
+
+
+def _priority_of(request: dict) -> int:
+    return PRIORITIES.get(request.get("priority"), PRIORITIES[DEFAULT_PRIORITY])
+
+
+class ScheduledBudget(Budget):
+    """
+    由调度器创建的预算。非 active 的任务在有 active 任务执行时于检查点暂停，
+    把解释器让给正在编辑的文档，暂停的时间不计入时间预算。
+    """
+
+    def __init__(
+        self,
+        seconds: float = None,
+        max_size: int = None,
+        priority: int = 0,
+        foreground: threading.Event = None,
+    ):
+        """
+        :param priority: 任务的优先级
+        :param foreground: 没有 active 任务执行时处于置位状态的事件
+        """
+        super().__init__(seconds, max_size)
+        self.priority = priority
+        self._foreground = foreground
+        self.paused = 0.0
+
+    def exhausted(self) -> bool:
+        foreground = self._foreground
+        if self.priority and foreground is not None and not foreground.is_set():
+            start = time.perf_counter()
+            while not foreground.wait(_PAUSE_POLL) and not self.cancelled:
+                pass
+            paused = time.perf_counter() - start
+            self.paused += paused
+            if self.deadline is not None:
+                self.deadline += paused
+        return super().exhausted()
+
+
+class _Job:
+    """
+    队列中的一条请求及其调度信息。
+    """
+
+    def __init__(self, request: dict, key, priority: int, seq: int):
+        self.request = request
+        self.key = key
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = time.perf_counter()
+        self.budget = None
+        # 出队时记录的 {priority, wait_ms, depth}，附加在响应的 "_queue" 中
+        self.stats = None
+
+
+class Scheduler:
+    """
+    常驻服务的多文档调度器：在线程池中并发处理多个文档的请求，
+    同一 uri 的请求按到达顺序依次执行，不同 uri 之间按优先级类别调度。
+
+    - 优先级高的文档先出队，同一类别内先到先得；
+    - 工作线程多于一个时保留一个只执行 active 请求的线程，
+      打开大量文件时正在编辑的文档也不需要排队等待后台文档；
+    - active 请求执行期间，其他请求在预算检查点暂停；
+    - 同一 uri 出现更新的 version 时，正在执行与排队中的旧版本请求会被取消。
+    """
+
+    def __init__(
+        self,
+        run,
+        emit,
+        workers: int = None,
+        time_budget: float = None,
+        max_size: int = None,
+    ):
+        """
+        :param run: 处理请求的函数 run(request, budget) -> 响应
+        :param emit: 输出响应的函数，会在多个工作线程中同时调用
+        :param workers: 工作线程数，默认为 CPU 核数且不超过 4
+        :param time_budget: 每个请求的默认时间预算（秒）
+        :param max_size: 每个请求的默认源码字符数上限
+        """
+        self._run = run
+        self._emit = emit
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._time_budget = time_budget
+        self._max_size = max_size
+
+        self._cond = threading.Condition()
+        # 没有 active 请求执行时置位
+        self._foreground = threading.Event()
+        self._foreground.set()
+
+        # uri -> 等待执行的任务；没有 uri 的请求各自使用独立的键
+        self._queues = {}
+        # (优先级, 序号, 键) 的最小堆，每个可执行的键在堆中有一个有效条目
+        self._ready = []
+        # 键 -> 其在堆中的有效条目 (优先级, 序号)
+        self._entries = {}
+        # 正在执行的键 -> 任务
+        self._running = {}
+        # uri -> 见到的最新 version
+        self._latest = {}
+        self._seq = 0
+        self._depth = 0
+        self._closing = False
+
+        self._max_depth = 0
+        self._classes = {
+            name: {"jobs": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+            for name in PRIORITIES
+        }
+        self._names = {value: name for name, value in PRIORITIES.items()}
+
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _is_stale(self, uri, version) -> bool:
+        return isinstance(version, int) and self._latest.get(uri, version) > version
+
+    def submit(self, request: dict) -> None:
+        """
+        请求入队。请求可以携带 priority（active、visible 或 background），
+        默认为 visible。
+
+        :param request: 形如 {id, uri, version, priority, ...} 的请求
+        """
+        priority = _priority_of(request)
+        uri, version = request.get("uri"), request.get("version")
+        with self._cond:
+            self._seq += 1
+            key = uri if uri is not None else ("", self._seq)
+            if uri is not None and isinstance(version, int):
+                self._latest[uri] = max(version, self._latest.get(uri, version))
+                running = self._running.get(uri)
+                if running is not None and self._is_stale(
+                    uri, running.request.get("version")
+                ):
+                    running.budget.cancel()
+            job = _Job(request, key, priority, self._seq)
+            self._queues.setdefault(key, deque()).append(job)
+            self._depth += 1
+            self._max_depth = max(self._max_depth, self._depth)
+            if key not in self._running:
+                self._schedule(key)
+            self._cond.notify_all()
+
+    def emit(self, response: dict) -> None:
+        """
+        直接输出不经过队列的响应，如无法解析的请求。
+        """
+        self._emit(response)
+
+    def _schedule(self, key) -> None:
+        """
+        按队列中最高的优先级把键放入就绪堆，已有同等或更高优先级的条目时不重复放入。
+        """
+        queue = self._queues[key]
+        priority = min(job.priority for job in queue)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= priority:
+            return
+        # 同一类别内按队首请求的到达顺序
+        entry = (priority, queue[0].seq)
+        self._entries[key] = entry
+        heapq.heappush(self._ready, (*entry, key))
+
+    def _next(self):
+        """
+        取出下一个可执行的任务，没有时返回 None。需要持有锁。
+        """
+        # 保留一个线程给 active 请求
+        reserve = self.workers > 1 and self._busy_background() >= self.workers - 1
+        skipped = []
+        job = None
+        while self._ready:
+            priority, seq, key = heapq.heappop(self._ready)
+            if self._entries.get(key) != (priority, seq):
+                # 已被更高优先级的条目取代
+                continue
+            if reserve and priority:
+                skipped.append((priority, seq, key))
+                continue
+            del self._entries[key]
+            queue = self._queues[key]
+            job = queue.popleft()
+            if not queue:
+                del self._queues[key]
+            break
+        for item in skipped:
+            heapq.heappush(self._ready, item)
+        return job
+
+    def _busy_background(self) -> int:
+        return sum(1 for job in self._running.values() if job.priority)
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while (job := self._next()) is None:
+                    if self._closing and not self._depth:
+                        return
+                    self._cond.wait()
+                self._depth -= 1
+                self._start(job)
+            if job.priority:
+                # 解析无法在中途暂停，有 active 请求执行时先不开始
+                job.budget.exhausted()
+            try:
+                response = self._run(job.request, job.budget)
+            except Exception as e:
+                response = {"id": job.request.get("id"), "error": repr(e)}
+            response["_queue"] = job.stats
+            self._emit(response)
+            with self._cond:
+                self._finish(job)
+                self._cond.notify_all()
+
+    def _start(self, job: _Job) -> None:
+        """
+        记录等待时间并创建预算。需要持有锁。
+        """
+        wait_ms = (time.perf_counter() - job.enqueued) * 1000
+        name = self._names[job.priority]
+        record = self._classes[name]
+        record["jobs"] += 1
+        record["wait_ms_total"] += wait_ms
+        record["wait_ms_max"] = max(record["wait_ms_max"], wait_ms)
+        job.stats = {
+            "priority": name,
+            "wait_ms": round(wait_ms, 3),
+            "depth": self._depth,
+        }
+
+        request = job.request
+        job.budget = ScheduledBudget(
+            request.get("timeBudget", self._time_budget),
+            request.get("maxSize", self._max_size),
+            job.priority,
+            self._foreground,
+        )
+        self._running[job.key] = job
+        if self._is_stale(request.get("uri"), request.get("version")):
+            job.budget.cancel()
+        if not job.priority:
+            self._foreground.clear()
+
+    def _finish(self, job: _Job) -> None:
+        """
+        需要持有锁。
+        """
+        del self._running[job.key]
+        if not any(not running.priority for running in self._running.values()):
+            self._foreground.set()
+        if job.key in self._queues:
+            self._schedule(job.key)
+
+    def close(self) -> None:
+        """
+        等待所有已提交的请求处理完毕后停止工作线程。
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> dict:
+        """
+        :return: 当前与历史最大队列深度、正在执行的请求数，
+            以及各优先级类别的请求数与等待时间（毫秒）
+        """
+        with self._cond:
+            classes = {}
+            for name, record in self._classes.items():
+                jobs = record["jobs"]
+                classes[name] = {
+                    "jobs": jobs,
+                    "wait_ms_mean": round(record["wait_ms_total"] / jobs, 3)
+                    if jobs
+                    else 0.0,
+                    "wait_ms_max": round(record["wait_ms_max"], 3),
+                }
+            return {
+                "workers": self.workers,
+                "depth": self._depth,
+                "max_depth": self._max_depth,
+                "running": len(self._running),
+                "classes": classes,
+            }
@@ -0,0 +1,169 @@
+import sys
+import json
+import threading
+
+from analysis import ANALYSIS_MODES, analyze, resolve_modes
+from budget import Budget
+from document_session import DocumentSession
+from metrics import Metrics, dump_profile, profiling_requested
+from result_cache import ResultCache
+from scheduler import Scheduler
+
+
+def handle_request(
+    request: dict,
+    sessions: dict = None,
+    cache: ResultCache = None,
+    budget: Budget = None,
+) -> dict:
+    """
+    处理常驻服务模式下的一条分析请求。
+
+    请求携带 text 时（重新）打开文档会话；携带 changes 时在已缓存的会话上
+    增量更新；携带 close 时释放会话；携带 stats 时返回缓存计数。
+    携带 profile 时在响应的 "_metrics" 中附带各阶段耗时，profile 可以是
+    {"cprofile": 文件, "tracemalloc": 文件}，为这一条请求导出剖析数据。
+
+    超出预算时响应带有 "truncated": true，结果为部分结果；请求被更新的版本
+    取代时响应带有 "cancelled": true 且不含结果，但文档修改仍然会被应用。
+
+    :param request: 形如 {id, uri, version, text | changes, modes, settings} 的请求
+    :param sessions: 以 uri 为键的文档会话缓存
+    :param cache: 结果缓存
+    :param budget: 本次请求的时间与大小预算及取消状态
+    :return: 与请求 id 对应的响应
+    """
+    uri = request.get("uri")
+    response = {
+        "id": request.get("id"),
+        "uri": uri,
+        "version": request.get("version"),
+    }
+    if sessions is None:
+        sessions = {}
+    if request.get("close"):
+        sessions.pop(uri, None)
+        response["closed"] = True
+        return response
+    if request.get("stats"):
+        response["stats"] = cache.stats() if cache is not None else {}
+        return response
+
+    modes = resolve_modes(request.get("modes") or [])
+    unknown = [mode for mode in modes if mode not in ANALYSIS_MODES]
+    if unknown:
+        response["error"] = f"unknown modes: {', '.join(unknown)}"
+        return response
+
+    budget = budget or Budget()
+    profile = request.get("profile")
+    if not profile and not profiling_requested():
+        _handle_analysis(request, modes, sessions, cache, response, budget)
+    else:
+        metrics = Metrics()
+        dumps = profile if isinstance(profile, dict) else {}
+        with dump_profile(dumps.get("cprofile"), dumps.get("tracemalloc")):
+            _handle_analysis(request, modes, sessions, cache, response, budget, metrics)
+        response["_metrics"] = metrics.as_dict()
+
+    if budget.cancelled:
+        response.pop("result", None)
+        response["cancelled"] = True
+    elif budget.truncated:
+        response["truncated"] = True
+    return response
+
+
+def _handle_analysis(
+    request: dict,
+    modes: list[str],
+    sessions: dict,
+    cache: ResultCache,
+    response: dict,
+    budget: Budget,
+    metrics: Metrics = None,
+) -> dict:
+    metrics = metrics or Metrics(enabled=False)
+    uri = request.get("uri")
+    if "changes" in request:
+        session = sessions.get(uri)
+        if session is None:
+            # 客户端需要重新发送全文
+            response["error"] = "unknown document"
+            return response
+        with metrics.phase("apply_changes"):
+            session.apply_changes(request["changes"], request.get("version"))
+    elif uri is not None:
+        session = DocumentSession(request.get("text", ""), request.get("version"))
+        sessions[uri] = session
+    else:
+        response["result"] = analyze(
+            request.get("text", ""),
+            modes,
+            request.get("settings"),
+            cache,
+            metrics=metrics,
+            budget=budget,
+        )
+        return response
+
+    response["result"] = analyze(
+        session.text, modes, request.get("settings"), cache, session, metrics, budget
+    )
+    return response
+
+
+def serve(
+    stdin=None,
+    stdout=None,
+    cache: ResultCache = None,
+    time_budget: float = None,
+    max_size: int = None,
+    workers: int = None,
+) -> None:
+    """
+    常驻服务模式：从标准输入逐行读取 JSON 请求，并逐行输出 JSON 响应。
+
+    每行一个请求 {id, uri, version, priority, text, modes}，响应携带相同的 id，
+    一个进程即可服务整个编辑会话，避免每次按键都重新启动解释器。
+
+    请求交给 Scheduler 在多个工作线程中处理：同一 uri 的请求依次执行，
+    priority 为 active 的请求优先于 visible 与 background，响应的顺序因此
+    可能与请求不同，"_queue" 中记录了请求的优先级、等待时间与出队时的队列深度。
+    同一 uri 出现更新的 version 时，队列中以及正在处理的旧版本请求会被取消。
+    请求可以用 timeBudget（秒）和 maxSize（字符数）覆盖默认预算，
+    携带 stats 时响应的 "scheduler" 中附带调度器的统计。
+    """
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout
+    cache = cache or ResultCache()
+    sessions = {}
+
+    def run(request: dict, budget: Budget) -> dict:
+        response = handle_request(request, sessions, cache, budget)
+        if request.get("stats"):
+            response["scheduler"] = scheduler.stats()
+        return response
+
+    lock = threading.Lock()
+
+    def emit(response: dict) -> None:
+        # 在锁外序列化，较大的后台结果不会阻塞其他线程输出
+        line = json.dumps(response) + "\n"
+        with lock:
+            stdout.write(line)
+            stdout.flush()
+
+    scheduler = Scheduler(run, emit, workers, time_budget, max_size)
+    for line in stdin:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            scheduler.emit({"id": None, "error": f"invalid request: {e}"})
+            continue
+        scheduler.submit(request)
+    scheduler.close()
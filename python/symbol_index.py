@@ -0,0 +1,329 @@
+import os
+import ast
+import time
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ast_parse import Range
+from result_cache import ResultCache
+from workspace_scan import (
+    DEFAULT_EXCLUDE,
+    _chunks,
+    _init_worker,
+    iter_python_files,
+    read_source,
+)
+
+
+# 表结构或符号提取方式变化时需要递增，旧的索引会被整体重建
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    module TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_module ON files (dir, module);
+CREATE TABLE IF NOT EXISTS symbols (
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    target TEXT,
+    start INTEGER,
+    end INTEGER
+);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+"""
+
+# 每个任务处理的文件数
+_CHUNK_SIZE = 64
+
+
+def module_of(path: str) -> tuple[str, str]:
+    """
+    文件作为模块被导入时所在的目录与模块名。
+
+    a/b/c.py 为 (a/b, c)，包的 a/b/__init__.py 为 (a, b)。
+
+    :param path: 文件绝对路径
+    :return: (目录, 模块名)
+    """
+    directory, filename = os.path.split(path)
+    module = os.path.splitext(filename)[0]
+    if module == "__init__":
+        directory, module = os.path.split(directory)
+    return directory, module
+
+
+def extract_symbols(text: str) -> list[tuple]:
+    """
+    提取模块顶层绑定的名称：类、函数，以及导入的名称与别名。
+
+    :param text: 源码文本
+    :return: [(名称, 类型, 导入目标, 起始, 结束)]，类型为 class、def 或 import，
+        起止为 UTF-16 偏移
+    """
+    myRange = Range(text)
+    if myRange._tree is None:
+        return []
+    symbols = []
+    for node in myRange._tree.body:
+        if isinstance(node, ast.ClassDef):
+            s, e = myRange._span(*myRange._name_span(node))
+            symbols.append((node.name, "class", None, s, e))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            s, e = myRange._span(*myRange._name_span(node))
+            symbols.append((node.name, "def", None, s, e))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            prefix = ""
+            if isinstance(node, ast.ImportFrom):
+                prefix = "." * node.level + (node.module or "") + "."
+            # 逐个 alias 取位置，同一语句中重复导入的名称互不覆盖
+            for n, parts, asname in myRange._import_alias_spans(node):
+                if asname is not None:
+                    name, (s, e) = n.asname, asname
+                elif isinstance(node, ast.Import):
+                    # import a.b 绑定的是 a
+                    name, (s, e) = n.name.split(".")[0], parts[0]
+                else:
+                    name, (s, e) = n.name, parts[0]
+                symbols.append((name, "import", prefix + n.name, s, e))
+    return symbols
+
+
+def _extract_file(path: str, old_digest: str):
+    """
+    读取并提取单个文件的符号，内容哈希未变化时不重新解析。
+
+    :return: (路径, mtime_ns, 大小, 哈希, 符号列表或 None)，读取或提取失败时返回 None
+    """
+    try:
+        stat = os.stat(path)
+        text = read_source(path)
+    except (OSError, SyntaxError, UnicodeDecodeError, LookupError):
+        return None
+    digest = ResultCache.digest(text)
+    if digest == old_digest:
+        return path, stat.st_mtime_ns, stat.st_size, digest, None
+    try:
+        symbols = extract_symbols(text)
+    except Exception:
+        # 单个文件提取失败不应使整次更新回滚，下次更新时重试
+        return None
+    return path, stat.st_mtime_ns, stat.st_size, digest, symbols
+
+
+def _extract_chunk(items: list[tuple[str, str]]) -> list:
+    return [_extract_file(path, old_digest) for path, old_digest in items]
+
+
+class SymbolIndex:
+    """
+    持久化在 SQLite 中的工作区符号索引，以路径、mtime 与内容哈希判断文件
+    是否需要重新提取，只更新变化的文件。用于跨文件的名称冲突检查。
+    """
+
+    def __init__(self, db_path: str):
+        """
+        :param db_path: SQLite 数据库文件，如扩展 storage 目录下的 symbols.db
+        """
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path)
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self._db.executescript(
+                "DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS symbols;"
+            )
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def update(
+        self,
+        paths: list[str],
+        include: list[str] = None,
+        exclude: list[str] = None,
+        jobs: int = None,
+    ) -> dict:
+        """
+        增量更新索引：新增或修改过的文件重新提取，已删除的文件从索引中移除。
+
+        :param paths: 工作区目录或文件列表
+        :param include: 需要索引的文件通配符，默认 *.py
+        :param exclude: 需要跳过的文件或目录通配符，追加在默认列表之后
+        :param jobs: 进程数，默认等于 CPU 核数，为 1 时在当前进程中执行
+        :return: {files, updated, removed, elapsed}
+        """
+        start = time.perf_counter()
+        include = include or ["*.py"]
+        exclude = DEFAULT_EXCLUDE + (exclude or [])
+        jobs = jobs or os.cpu_count() or 1
+        roots = [os.path.abspath(path) for path in paths]
+
+        known = {
+            path: (mtime_ns, size, digest)
+            for path, mtime_ns, size, digest in self._db.execute(
+                "SELECT path, mtime_ns, size, digest FROM files"
+            )
+        }
+        seen = set()
+        changed = []
+        for path in iter_python_files(roots, include, exclude):
+            path = os.path.abspath(path)
+            seen.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            old = known.get(path)
+            if old is None or old[:2] != (stat.st_mtime_ns, stat.st_size):
+                changed.append((path, old[2] if old else None))
+
+        # 只移除这次扫描的根目录下已经不存在的文件
+        removed = [
+            path
+            for path in known
+            if path not in seen
+            and any(path == root or path.startswith(root + os.sep) for root in roots)
+        ]
+
+        updated = 0
+        with self._db:
+            self._db.executemany(
+                "DELETE FROM files WHERE path = ?", [(p,) for p in removed]
+            )
+            self._db.executemany(
+                "DELETE FROM symbols WHERE path = ?", [(p,) for p in removed]
+            )
+            for record in self._extract(changed, jobs):
+                if record is not None:
+                    updated += self._store(*record)
+
+        return {
+            "files": len(seen),
+            "updated": updated,
+            "removed": len(removed),
+            "elapsed": round(time.perf_counter() - start, 3),
+        }
+
+    def _extract(self, changed: list, jobs: int):
+        if jobs == 1 or len(changed) <= _CHUNK_SIZE:
+            _init_worker()
+            for path, old_digest in changed:
+                yield _extract_file(path, old_digest)
+            return
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(_extract_chunk, chunk)
+                for chunk in _chunks(changed, _CHUNK_SIZE)
+            ]
+            for future in as_completed(futures):
+                yield from future.result()
+
+    def _store(self, path, mtime_ns, size, digest, symbols) -> int:
+        """
+        :return: 符号是否被重新写入
+        """
+        directory, module = module_of(path)
+        self._db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            (path, directory, module, mtime_ns, size, digest),
+        )
+        if symbols is None:
+            # 只是 mtime 变化，内容没有变化
+            return 0
+        self._db.execute("DELETE FROM symbols WHERE path = ?", (path,))
+        self._db.executemany(
+            "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)",
+            [(path, *symbol) for symbol in symbols],
+        )
+        return 1
+
+    def lookup(self, name: str) -> list[dict]:
+        """
+        查找工作区中绑定了指定名称的所有顶层符号。
+
+        :param name: 名称
+        :return: [{path, kind, target, range}]
+        """
+        return [
+            {"path": path, "kind": kind, "target": target, "range": [start, end]}
+            for path, kind, target, start, end in self._db.execute(
+                "SELECT path, kind, target, start, end FROM symbols WHERE name = ?",
+                (name,),
+            )
+        ]
+
+    def conflicts(self, path: str, text: str) -> list[dict]:
+        """
+        检查文件中定义的类是否与工作区中的其他名称冲突：
+        与同目录下的模块或子包同名，或与所在包 __init__.py 中导出的名称同名。
+
+        :param path: 文件路径，用于确定所在目录与包
+        :param text: 文件当前的文本，可以是编辑器中尚未保存的内容
+        :return: [{class, name, path, kind, target, range}]，class 为本文件中
+            类名的 UTF-16 偏移区间，range 为冲突位置，模块冲突时为 None
+        """
+        path = os.path.abspath(path)
+        directory = os.path.dirname(path)
+        package_init = os.path.join(directory, "__init__.py")
+
+        myRange = Range(text)
+        myRange._dispatch([Range._scan_class_name])
+        result = []
+        for name, span in myRange._classes_range_map.items():
+            for (other,) in self._db.execute(
+                "SELECT path FROM files WHERE dir = ? AND module = ? AND path != ?",
+                (directory, name, path),
+            ):
+                result.append(
+                    {
+                        "class": span,
+                        "name": name,
+                        "path": other,
+                        "kind": "module",
+                        "target": None,
+                        "range": None,
+                    }
+                )
+            if path == package_init:
+                continue
+            for kind, target, start, end in self._db.execute(
+                "SELECT kind, target, start, end FROM symbols "
+                "WHERE path = ? AND name = ?",
+                (package_init, name),
+            ):
+                # 包从本模块导出的同名类不是冲突
+                if kind == "import" and _exports_from(target, path, name):
+                    continue
+                result.append(
+                    {
+                        "class": span,
+                        "name": name,
+                        "path": package_init,
+                        "kind": kind,
+                        "target": target,
+                        "range": [start, end],
+                    }
+                )
+        return result
+
+
+def _exports_from(target: str, path: str, name: str) -> bool:
+    """
+    判断包 __init__.py 中的导入 target 是否正是从 path 模块导入 name，
+    如 from .models import User 之于 models.py 中的 User。
+    """
+    module = os.path.splitext(os.path.basename(path))[0]
+    return target in (f".{module}.{name}", f"{module}.{name}") or target.endswith(
+        f".{module}.{name}"
+    )
+
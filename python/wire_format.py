@@ -0,0 +1,175 @@
+import sys
+import json
+import struct
+from array import array
+
+
+# 帧格式：<u32 头部长度><u32 数据块长度><头部 JSON><数据块>，整数均为小端序。
+# 头部为 {"mode", "n", "ints", "values"}，ints 是整数列，values 是字符串等其他列。
+# 打包时整数列以 int32 写入数据块，头部带有 "packed": true，对应的列变为
+# [起始元素下标, 元素个数]，结果为空时数据块也为空。最后一帧的头部为 {"end": true}。
+_PREFIX = struct.Struct("<II")
+_SEPARATORS = (",", ":")
+
+# 区间缺失时（如没有 as 别名）写入的占位值
+_MISSING = (-1, -1)
+
+
+def _flat(spans) -> list[int]:
+    return [offset for span in spans for offset in span]
+
+
+def _records(*fields: str):
+    """
+    每项为 {字段: 区间} 的列表结果，每个字段成为一列 [起始, 结束, 起始, 结束, ...]。
+    """
+
+    def encode(result: list[dict]):
+        ints = {field: _flat(item[field] for item in result) for field in fields}
+        return len(result), ints, {}
+
+    return encode
+
+
+def _import_columns(imports: list[dict]) -> dict:
+    """
+    {"name": [区间, ...], "asname": 区间} 形式的导入区间：name 的区间依次展平，
+    name_count 记录每项的区间个数，缺失的 asname 写入占位值。
+    """
+    return {
+        "name": _flat(span for item in imports for span in item["name"]),
+        "name_count": [len(item["name"]) for item in imports],
+        "asname": _flat(item.get("asname", _MISSING) for item in imports),
+    }
+
+
+def _encode_import_names(result: dict):
+    names = list(result)
+    ints = _import_columns([result[name] for name in names])
+    return len(names), ints, {"key": names}
+
+
+def _encode_name_conflicts(result: list[dict]):
+    ints = {"class": _flat(item["class"] for item in result)}
+    ints.update(_import_columns([item["import"] for item in result]))
+    return len(result), ints, {}
+
+
+def _encode_attrs(result: list[dict]):
+    ints = {
+        "line": [item["line"] for item in result],
+        "col": [item["col"] for item in result],
+        "occurrences": _flat(
+            span for item in result for span in item["occurrences"]
+        ),
+        "occurrence_count": [len(item["occurrences"]) for item in result],
+    }
+    values = {
+        "path": [item["path"] for item in result],
+        "parent_class": [item.get("parent_class") for item in result],
+    }
+    return len(result), ints, values
+
+
+def _encode_colors(result: list[list]):
+    ints = {
+        "range": _flat(item[:2] for item in result),
+        "rgb": _flat(item[2:5] for item in result),
+    }
+    values = {
+        "alpha": [item[5] for item in result],
+        "format": [item[6] for item in result],
+    }
+    return len(result), ints, values
+
+
+# 各模式结果的列式编码方式：结果 -> (行数, 整数列, 其他列)
+_ENCODERS = {
+    "get_classes_without_parent_init_call": _records("class", "func"),
+    "get_modules_with_name_conflicts": _encode_name_conflicts,
+    "get_for_loop_variable_conflicts": _records("variable", "iterable"),
+    "get_import_names_range": _encode_import_names,
+    "get_all_attr": _encode_attrs,
+    "color_scan": _encode_colors,
+}
+
+
+def _frame(header: dict, blob: bytes = b"") -> bytes:
+    data = json.dumps(header, separators=_SEPARATORS).encode("utf-8")
+    return _PREFIX.pack(len(data), len(blob)) + data + blob
+
+
+def encode_frame(mode: str, result, binary: bool = False) -> bytes:
+    """
+    把一个模式的结果编码为一帧。没有列式编码方式的模式，
+    结果原样放在头部的 "result" 中。
+
+    :param mode: 模式名
+    :param result: 模式结果
+    :param binary: 为 True 时把整数列打包为 int32 数据块
+    :return: 帧的字节
+    """
+    encoder = _ENCODERS.get(mode)
+    if encoder is None:
+        return _frame({"mode": mode, "result": result})
+    n, ints, values = encoder(result)
+    header = {"mode": mode, "n": n, "ints": ints, "values": values}
+    if not binary:
+        return _frame(header)
+    header["packed"] = True
+
+    packed = array("i")
+    for name, column in ints.items():
+        ints[name] = [len(packed), len(column)]
+        packed.extend(column)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return _frame(header, packed.tobytes())
+
+
+def write_frames(stream, results, binary: bool = False) -> int:
+    """
+    每得到一个模式的结果就写出一帧并立即刷新，最后写出结束帧。
+
+    :param stream: 二进制输出流，如 sys.stdout.buffer
+    :param results: 依次产生 (模式名, 结果) 的可迭代对象
+    :param binary: 为 True 时把整数列打包为 int32 数据块
+    :return: 写出的字节数
+    """
+    size = 0
+    for mode, result in results:
+        frame = encode_frame(mode, result, binary)
+        stream.write(frame)
+        stream.flush()
+        size += len(frame)
+    end = _frame({"end": True})
+    stream.write(end)
+    stream.flush()
+    return size + len(end)
+
+
+def read_frames(data: bytes):
+    """
+    解码 write_frames 写出的字节，依次产生每一帧的头部，
+    打包的整数列会被还原为列表。benchmark.py --wire-format 用它检查编码往返。
+
+    :param data: 帧字节
+    """
+    pos = 0
+    while pos < len(data):
+        header_len, blob_len = _PREFIX.unpack_from(data, pos)
+        pos += _PREFIX.size
+        header = json.loads(data[pos : pos + header_len])
+        pos += header_len
+        if header.get("packed"):
+            # 结果为空时数据块为空，列仍是 [0, 0] 形式的位置，需要还原为空列表
+            packed = array("i")
+            packed.frombytes(data[pos : pos + blob_len])
+            if sys.byteorder != "little":
+                packed.byteswap()
+            header["ints"] = {
+                name: packed[start : start + count].tolist()
+                for name, (start, count) in header["ints"].items()
+            }
+        pos += blob_len
+        yield header
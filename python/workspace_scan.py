@@ -0,0 +1,187 @@
+import io
+import os
+import sys
+import json
+import time
+import fnmatch
+import tokenize
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ast_parse import Range
+from rule_engine import RuleEngine
+
+
+# 默认跳过的目录与文件
+DEFAULT_EXCLUDE = [
+    ".git",
+    ".hg",
+    ".svn",
+    ".tox",
+    ".nox",
+    ".venv",
+    "venv",
+    "__pycache__",
+    "node_modules",
+    "*.egg-info",
+]
+
+# 每个任务处理的文件数，减少进程间通信次数
+_CHUNK_SIZE = 16
+
+# scan 的退出码：有诊断结果为 1；有文件读取或分析失败为 3，优先于 1，
+# 使 CI 能区分分析器出错与代码中的问题
+EXIT_FINDINGS = 1
+EXIT_ERRORS = 3
+
+
+def _match(path: str, name: str, patterns: list[str]) -> bool:
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(path, p) for p in patterns)
+
+
+def iter_python_files(paths: list[str], include: list[str], exclude: list[str]):
+    """
+    遍历目录，按 include / exclude 通配符筛选出待分析的文件。
+
+    :param paths: 文件或目录列表
+    :param include: 文件名或相对路径需要匹配的通配符
+    :param exclude: 需要跳过的文件或目录通配符
+    :return: 文件路径生成器
+    """
+    for root_path in paths:
+        if os.path.isfile(root_path):
+            yield root_path
+            continue
+        for dirpath, dirnames, filenames in os.walk(root_path):
+            rel_dir = os.path.relpath(dirpath, root_path)
+            # 原地修改 dirnames，使 os.walk 不再进入被排除的目录
+            dirnames[:] = sorted(
+                d
+                for d in dirnames
+                if not _match(os.path.normpath(os.path.join(rel_dir, d)), d, exclude)
+            )
+            for filename in sorted(filenames):
+                rel = os.path.normpath(os.path.join(rel_dir, filename))
+                if _match(rel, filename, include) and not _match(
+                    rel, filename, exclude
+                ):
+                    yield os.path.join(dirpath, filename)
+
+
+def read_source(path: str) -> str:
+    """
+    按 PEP 263 编码声明读取源码，保留原始换行以保证偏移与磁盘文件一致。
+
+    :param path: 文件路径
+    :return: 源码文本
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+    if encoding == "utf-8-sig":
+        data = data.removeprefix(b"\xef\xbb\xbf")
+        encoding = "utf-8"
+    return data.decode(encoding)
+
+
+def analyze_file(path: str, modes: list[str]) -> dict:
+    """
+    分析单个文件。
+
+    :param path: 文件路径
+    :param modes: 分析模式列表
+    :return: {path, result} 或 {path, error}
+    """
+    try:
+        text = read_source(path)
+    except (OSError, SyntaxError, UnicodeDecodeError, LookupError) as e:
+        return {"path": path, "error": repr(e)}
+    try:
+        return {"path": path, "result": RuleEngine().run(Range(text), modes)}
+    except Exception as e:
+        # 规则内部的异常只影响当前文件，不中断整个扫描
+        return {"path": path, "error": repr(e)}
+
+
+def _analyze_chunk(paths: list[str], modes: list[str]) -> list[dict]:
+    return [analyze_file(path, modes) for path in paths]
+
+
+def _init_worker() -> None:
+    # 源码中的无效转义等 SyntaxWarning 不应刷屏
+    warnings.simplefilter("ignore")
+
+
+def _chunks(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def scan(
+    paths: list[str],
+    modes: list[str],
+    include: list[str] = None,
+    exclude: list[str] = None,
+    jobs: int = None,
+    stdout=None,
+) -> int:
+    """
+    并行分析工作区中的文件，每完成一个文件输出一行 JSON，最后输出汇总行。
+
+    :param paths: 文件或目录列表
+    :param modes: 分析模式列表
+    :param include: 需要分析的文件通配符，默认 *.py
+    :param exclude: 需要跳过的文件或目录通配符，追加在默认列表之后
+    :param jobs: 进程数，默认等于 CPU 核数，为 1 时在当前进程中执行
+    :param stdout: 输出流
+    :return: 退出码，没有问题时为 0，有诊断结果时为 EXIT_FINDINGS，
+        有文件读取或分析失败时为 EXIT_ERRORS
+    """
+    stdout = stdout or sys.stdout
+    include = include or ["*.py"]
+    exclude = DEFAULT_EXCLUDE + (exclude or [])
+    jobs = jobs or os.cpu_count() or 1
+    engine = RuleEngine()
+    diagnostics = [mode for mode in modes if mode in engine.diagnostics]
+
+    summary = {"files": 0, "errors": 0, "findings": 0, "files_with_findings": 0}
+    start = time.perf_counter()
+
+    def emit(record: dict) -> None:
+        summary["files"] += 1
+        if "error" in record:
+            summary["errors"] += 1
+        else:
+            findings = sum(len(record["result"][mode]) for mode in diagnostics)
+            summary["findings"] += findings
+            summary["files_with_findings"] += bool(findings)
+        stdout.write(json.dumps(record) + "\n")
+
+    files = iter_python_files(paths, include, exclude)
+    if jobs == 1:
+        _init_worker()
+        for path in files:
+            emit(analyze_file(path, modes))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(_analyze_chunk, chunk, modes)
+                for chunk in _chunks(files, _CHUNK_SIZE)
+            ]
+            for future in as_completed(futures):
+                for record in future.result():
+                    emit(record)
+                stdout.flush()
+
+    summary["elapsed"] = round(time.perf_counter() - start, 3)
+    stdout.write(json.dumps({"summary": summary}) + "\n")
+    stdout.flush()
+    if summary["errors"]:
+        return EXIT_ERRORS
+    return EXIT_FINDINGS if summary["findings"] else 0